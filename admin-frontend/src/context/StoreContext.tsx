@@ -9,7 +9,7 @@ interface StoreContextType {
     categories: Category[];
     stories: Story[];
     addProduct: (product: Product) => void;
-    updateProduct: (id: string, product: Product) => void;
+    updateProduct: (id: string, product: Product, stockDelta?: number) => void;
     deleteProduct: (id: string) => void;
     addPage: (page: Page) => void;
     updatePage: (id: string, page: Page) => void;
@@ -86,9 +86,13 @@ export const StoreProvider: React.FC<{ children: React.ReactNode }> = ({ childre
         }
     };
 
-    const updateProduct = async (id: string, product: Product) => {
+    const updateProduct = async (id: string, product: Product, stockDelta = 0) => {
         try {
-            const res = await api.put(`/products/${id}/`, product);
+            // Stock is ignored by PUT; it is adjusted atomically by the change
+            let res = await api.put(`/products/${id}/`, product);
+            if (stockDelta) {
+                res = await api.post(`/products/${id}/stock/`, { delta: stockDelta });
+            }
             setProducts(products.map((p: Product) => (p.id === id || p._id === id) ? res.data : p));
         } catch (err: any) {
             console.error(err);
@@ -34,6 +34,8 @@ const ProductEditor = () => {
     });
 
     const [saving, setSaving] = useState(false);
+    // Stock as loaded into the editor; saves send the change, not the total
+    const [loadedStock, setLoadedStock] = useState(0);
 
     useEffect(() => {
         if (!isNew && id) {
@@ -49,6 +51,7 @@ const ProductEditor = () => {
                     video: product.videos ? product.videos[0] : '',
                     is_active: product.is_active
                 });
+                setLoadedStock(product.stock);
             }
         }
     }, [id, isNew, products, categories]);
@@ -73,7 +76,7 @@ const ProductEditor = () => {
             if (isNew) {
                 await addProduct(productData);
             } else if (id) {
-                await updateProduct(id, productData);
+                await updateProduct(id, productData, productData.stock - loadedStock);
             }
             navigate('/products');
         } catch (err) {
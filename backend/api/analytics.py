@@ -0,0 +1,136 @@
+import atexit
+import datetime
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .models import AnalyticsRollup
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_VIEW = "product_view"
+COUPON_ATTEMPT = "coupon_attempt"
+# Rollup key shared by every attempt with a code that matches no coupon
+UNKNOWN_COUPON = "unknown"
+
+
+def bucket_start(moment, bucket_seconds):
+    # Align a naive UTC timestamp to the start of its rollup bucket (e.g. the hour)
+    epoch = datetime.datetime(1970, 1, 1)
+    seconds = int((moment - epoch).total_seconds())
+    return epoch + datetime.timedelta(seconds=seconds - seconds % bucket_seconds)
+
+
+class CounterBuffer:
+    """
+    Aggregates analytics increments in memory and writes them to the rollup
+    collection as a single unordered bulk_write of $inc upserts.
+
+    Recording a hit is a dict increment under a lock; the Mongo round trip
+    happens on a background thread, either every `flush_interval` seconds or
+    as soon as `flush_threshold` distinct counters are pending. Pending
+    counts are flushed once more at interpreter exit so a graceful worker
+    shutdown does not lose them.
+    """
+
+    def __init__(self, flush_interval=10, flush_threshold=500, bucket_seconds=3600):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.bucket_seconds = bucket_seconds
+        self._counts = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def increment(self, kind, key, field="count", amount=1):
+        bucket = bucket_start(datetime.datetime.utcnow(), self.bucket_seconds)
+        with self._lock:
+            self._counts[(kind, str(key), bucket, field)] += amount
+            pending = len(self._counts)
+        self._ensure_started()
+        if pending >= self.flush_threshold:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, defaultdict(int)
+            if not counts:
+                return 0
+
+            grouped = defaultdict(dict)
+            for (kind, key, bucket, field), amount in counts.items():
+                grouped[(kind, key, bucket)][field] = amount
+
+            ops = [
+                UpdateOne(
+                    {"kind": kind, "key": key, "bucket": bucket},
+                    {"$inc": incs},
+                    upsert=True,
+                )
+                for (kind, key, bucket), incs in grouped.items()
+            ]
+            try:
+                AnalyticsRollup._get_collection().bulk_write(ops, ordered=False)
+            except Exception:
+                logger.exception("Analytics flush failed; keeping %d counters for retry", len(counts))
+                # Put the counts back so the next flush retries them. A partial
+                # unordered write may double count a few rows, which is
+                # acceptable for merchandising stats.
+                with self._lock:
+                    for counter, amount in counts.items():
+                        self._counts[counter] += amount
+                return 0
+            return len(ops)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="analytics-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+buffer = CounterBuffer(
+    flush_interval=getattr(settings, "ANALYTICS_FLUSH_INTERVAL", 10),
+    flush_threshold=getattr(settings, "ANALYTICS_FLUSH_THRESHOLD", 500),
+    bucket_seconds=getattr(settings, "ANALYTICS_BUCKET_SECONDS", 3600),
+)
+
+
+def track_product_view(product_id):
+    buffer.increment(PRODUCT_VIEW, product_id)
+
+
+def track_coupon_attempt(code, outcome):
+    # One rollup row per coupon and bucket, with a counter per outcome
+    # ("applied", "expired", "not_found", ...) next to the overall total.
+    buffer.increment(COUPON_ATTEMPT, code)
+    buffer.increment(COUPON_ATTEMPT, code, field=outcome)
+
+
+def top_products(window_hours=24, limit=10):
+    since = bucket_start(
+        datetime.datetime.utcnow() - datetime.timedelta(hours=window_hours),
+        buffer.bucket_seconds,
+    )
+    pipeline = [
+        {"$match": {"kind": PRODUCT_VIEW, "bucket": {"$gte": since}}},
+        {"$group": {"_id": "$key", "views": {"$sum": "$count"}}},
+        {"$sort": {"views": -1}},
+        {"$limit": limit},
+    ]
+    return list(AnalyticsRollup._get_collection().aggregate(pipeline))
@@ -0,0 +1,111 @@
+import datetime
+
+from bson import ObjectId
+from mongoengine.queryset.visitor import Q
+from pymongo import UpdateOne
+
+from .models import Category, Product
+
+# Products store category references as plain strings. Depending on which
+# client wrote them these are the category name, slug or id, so every
+# category is matched on all three.
+ACTIVE_PRODUCT = {"is_active": {"$ne": False}}
+SELLING_PRICE = {"$ifNull": ["$discount_price", "$price"]}
+EMPTY_STATS = {"product_count": 0, "min_price": None, "max_price": None}
+
+
+def category_keys(category):
+    return [str(category.id), category.name, category.slug]
+
+
+def categories_for_refs(refs):
+    refs = [ref for ref in refs if ref]
+    if not refs:
+        return []
+    ids = [ObjectId(ref) for ref in refs if ObjectId.is_valid(ref)]
+    return list(Category.objects(Q(name__in=refs) | Q(slug__in=refs) | Q(id__in=ids)))
+
+
+def _stats_update(category_id, stats, computed_at):
+    # Stats carry the time their aggregation started. A refresh that started
+    # earlier (and so may have missed a product write) never overwrites one
+    # that started later, whichever of the two finishes last.
+    return UpdateOne(
+        {"_id": category_id, "$or": [
+            {"stats_updated_at": None},
+            {"stats_updated_at": {"$lt": computed_at}},
+        ]},
+        {"$set": {
+            "product_count": stats["product_count"],
+            "min_price": stats["min_price"],
+            "max_price": stats["max_price"],
+            "stats_updated_at": computed_at,
+        }},
+    )
+
+
+def refresh_categories(categories):
+    """Recompute product count and price range for the given categories only."""
+    products = Product._get_collection()
+    ops = []
+    for category in categories:
+        computed_at = datetime.datetime.utcnow()
+        pipeline = [
+            {"$match": {**ACTIVE_PRODUCT, "category_ids": {"$in": category_keys(category)}}},
+            {"$group": {
+                "_id": None,
+                "product_count": {"$sum": 1},
+                "min_price": {"$min": SELLING_PRICE},
+                "max_price": {"$max": SELLING_PRICE},
+            }},
+        ]
+        stats = next(products.aggregate(pipeline), EMPTY_STATS)
+        ops.append(_stats_update(category.id, stats, computed_at))
+    if ops:
+        Category._get_collection().bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def refresh_for_product_change(old_refs=(), new_refs=()):
+    # A product moving between categories affects both the old and new ones
+    return refresh_categories(categories_for_refs(set(old_refs) | set(new_refs)))
+
+
+def _merge(stats, row):
+    stats["product_count"] += row["product_count"]
+    for field, pick in (("min_price", min), ("max_price", max)):
+        if row[field] is not None:
+            stats[field] = row[field] if stats[field] is None else pick(stats[field], row[field])
+
+
+def rebuild_all():
+    """
+    Rebuild every category's stats from one pass over the active products,
+    grouped by category reference, then fold each reference (id, name or
+    slug) into the category it names. A product that lists one category
+    under two different references is counted once per reference.
+    """
+    computed_at = datetime.datetime.utcnow()
+    pipeline = [
+        {"$match": ACTIVE_PRODUCT},
+        {"$unwind": "$category_ids"},
+        {"$group": {
+            "_id": "$category_ids",
+            "product_count": {"$sum": 1},
+            "min_price": {"$min": SELLING_PRICE},
+            "max_price": {"$max": SELLING_PRICE},
+        }},
+    ]
+    by_ref = {row["_id"]: row for row in Product._get_collection().aggregate(pipeline)}
+
+    ops = []
+    for category in Category._get_collection().find({}, {"name": 1, "slug": 1}):
+        stats = dict(EMPTY_STATS)
+        # A name and a slug can coincide; count each reference only once
+        for ref in {str(category["_id"]), category.get("name"), category.get("slug")}:
+            if ref in by_ref:
+                _merge(stats, by_ref[ref])
+        ops.append(_stats_update(category["_id"], stats, computed_at))
+    if ops:
+        Category._get_collection().bulk_write(ops, ordered=False)
+    return len(ops)
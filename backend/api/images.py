@@ -0,0 +1,200 @@
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from . import response_cache
+
+logger = logging.getLogger(__name__)
+
+# Which string fields on each document hold image paths
+IMAGE_FIELDS = {
+    'Product': ['images'],
+    'Story': ['thumbnailImage', 'heroImage'],
+    'Category': ['media_url'],
+    'Hero': ['backgroundImage'],
+}
+# Cached API resource each document type is served under
+CACHE_RESOURCES = {
+    'Product': 'products',
+    'Story': 'stories',
+    'Category': 'categories',
+    'Hero': 'hero',
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.bmp', '.tiff'}
+# Pillow's detected format -> extension used for stored originals
+FORMAT_EXTENSIONS = {
+    'PNG': '.png',
+    'JPEG': '.jpg',
+    'WEBP': '.webp',
+    'GIF': '.gif',
+    'BMP': '.bmp',
+    'TIFF': '.tiff',
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+    thread_name_prefix='image-variants',
+)
+
+
+def media_root():
+    return Path(settings.MEDIA_ROOT)
+
+
+def media_url(relative):
+    return settings.MEDIA_URL + relative.replace(os.sep, '/')
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:20]
+
+
+def resolve_source(path):
+    """Map an image path stored on a document to a file on local disk."""
+    if not path or '://' in path:
+        return None
+    if path.startswith(settings.MEDIA_URL):
+        candidate = media_root() / path[len(settings.MEDIA_URL):]
+        return candidate if candidate.is_file() else None
+    for directory in getattr(settings, 'IMAGE_SOURCE_DIRS', []):
+        candidate = Path(directory) / path.lstrip('/')
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def store_original(data, image_format):
+    # The extension comes from the decoded format, never the client filename,
+    # so image_sources() always recognises the stored original.
+    ext = FORMAT_EXTENSIONS[image_format]
+    digest = content_hash(data)
+    relative = os.path.join('originals', digest[:2], f'{digest}{ext}')
+    target = media_root() / relative
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(data)
+    return media_url(relative)
+
+
+def build_variants(data, source):
+    """
+    Resize an image to each configured width no wider than the original and
+    encode it as WebP and JPEG under content-hashed filenames. Files that
+    already exist are reused, so re-ingesting the same bytes is free.
+    """
+    digest = content_hash(data)
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original)
+        width, height = original.size
+        has_alpha = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+        widths = [w for w in settings.IMAGE_VARIANT_WIDTHS if w < width] + [width]
+
+        variants = []
+        for target_width in sorted(set(widths)):
+            target_height = max(1, round(height * target_width / width))
+            resized = None
+            for fmt, options in FORMATS.items():
+                relative = os.path.join('variants', digest[:2], f'{digest}-{target_width}w.{fmt}')
+                path = media_root() / relative
+                if not path.exists():
+                    if resized is None:
+                        resized = original.resize((target_width, target_height), Image.LANCZOS)
+                    image = resized
+                    if fmt == 'jpeg':
+                        image = _flatten(resized) if has_alpha else resized.convert('RGB')
+                    elif image.mode not in ('RGB', 'RGBA'):
+                        image = image.convert('RGBA' if has_alpha else 'RGB')
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(path.suffix + '.tmp')
+                    image.save(tmp, **options)
+                    os.replace(tmp, path)
+                variants.append({
+                    'width': target_width,
+                    'height': target_height,
+                    'format': fmt,
+                    'url': media_url(relative),
+                    'bytes': path.stat().st_size,
+                })
+
+    return {
+        'source': source,
+        'hash': digest,
+        'width': width,
+        'height': height,
+        'variants': variants,
+    }
+
+
+def _flatten(image):
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.convert('RGBA').split()[-1])
+    return background
+
+
+def image_sources(document):
+    sources = []
+    for field in IMAGE_FIELDS.get(type(document).__name__, []):
+        value = getattr(document, field, None)
+        for path in (value if isinstance(value, list) else [value]):
+            if path and Path(path.split('?')[0]).suffix.lower() in IMAGE_EXTENSIONS:
+                sources.append(path)
+    return sources
+
+
+def attach_variants(model, pk):
+    """Generate variants for every image on a document and record the set."""
+    # Reload so the job sees the latest image paths, not the request's copy.
+    # The raw document is read because mongoengine fills in field defaults,
+    # and the guard below has to match what is actually stored.
+    fields = IMAGE_FIELDS.get(model.__name__, [])
+    raw = model._get_collection().find_one({'_id': pk}, [*fields, 'image_variants'])
+    if raw is None:
+        return []
+    read = {field: raw[field] if field in raw else {'$exists': False} for field in fields}
+    document = model._from_son(raw)
+    existing = {v.get('source'): v for v in (document.image_variants or [])}
+    variant_sets = []
+    for source in image_sources(document):
+        if source in existing:
+            variant_sets.append(existing[source])
+            continue
+        path = resolve_source(source)
+        if path is None:
+            continue
+        try:
+            variant_sets.append(build_variants(path.read_bytes(), source))
+        except (OSError, Image.DecompressionBombError):
+            logger.exception("Could not build variants for %s", source)
+
+    # Written with a raw $set so a concurrent admin save of other fields is
+    # not overwritten by this background job, and only while the image fields
+    # still hold what this job read: a newer job owns the variants otherwise.
+    model._get_collection().update_one(
+        {'_id': pk, **read},
+        {'$set': {'image_variants': variant_sets}},
+    )
+    response_cache.invalidate(CACHE_RESOURCES[model.__name__])
+    return variant_sets
+
+
+def schedule_variants(document):
+    """Queue variant generation so API requests never wait on image work."""
+    future = executor.submit(attach_variants, type(document), document.id)
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error("Image variant job failed", exc_info=error)
@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+
+from api.models import Block, Page, Section
+from api.serializers import PageSerializer
+
+
+def payload(block_count, per_section=20):
+    sections = []
+    for s in range(max(1, -(-block_count // per_section))):
+        blocks = [{
+            'id': f's{s}b{b}', 'type': 'text',
+            'content': {'text': 'Authentic flavours, delivered to your doorstep.'},
+            'styles': {'fontSize': '18px'}, 'animations': {'type': 'fade'},
+        } for b in range(min(per_section, block_count - s * per_section))]
+        sections.append({'id': f's{s}', 'layout': 'boxed', 'order': s, 'blocks': blocks})
+    return {'name': 'Benchmark', 'slug': f'bench-{time.time_ns()}', 'status': 'draft', 'sections': sections}
+
+
+def legacy_save(page, data):
+    # The previous write path: DRF nested validation, then Section/Block
+    # documents rebuilt and validated again by mongoengine on save().
+    serializer = PageSerializer(page, data=data)
+    validated = serializers.Serializer.run_validation(serializer, data)
+    sections = []
+    for section_data in validated.pop('sections', []):
+        blocks_data = section_data.pop('blocks', [])
+        section = Section(**section_data)
+        section.blocks = [Block(**b) for b in blocks_data]
+        sections.append(section)
+    for attr, value in validated.items():
+        setattr(page, attr, value)
+    page.sections = sections
+    page.save()
+
+
+def current_save(page, data):
+    serializer = PageSerializer(page, data=data)
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+class Command(BaseCommand):
+    help = "Benchmark admin page save latency against block count for the old and new write paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocks', default='10,100,500,1000', help="Comma-separated block counts")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'blocks':>7} {'legacy ms':>11} {'compiled ms':>12} {'speedup':>8}")
+        for count in [int(n) for n in options['blocks'].split(',')]:
+            data = payload(count)
+            page = Page(name='Benchmark', slug=data['slug'])
+            page.save()
+            try:
+                timings = []
+                for save in (legacy_save, current_save):
+                    save(page, data)  # warm up
+                    start = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        save(page, data)
+                    timings.append((time.perf_counter() - start) / options['repeat'] * 1000)
+            finally:
+                page.delete()
+            legacy_ms, compiled_ms = timings
+            self.stdout.write(f"{count:>7} {legacy_ms:>11.2f} {compiled_ms:>12.2f} {legacy_ms / compiled_ms:>7.1f}x")
@@ -0,0 +1,88 @@
+import datetime
+import gzip
+import time
+from decimal import Decimal
+
+import brotli
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+
+
+def legacy_convert(data):
+    # The per-payload walk MongoSerializer used to do before rendering
+    if isinstance(data, list):
+        return [legacy_convert(item) for item in data]
+    if isinstance(data, dict):
+        return {k: legacy_convert(v) for k, v in data.items()}
+    if isinstance(data, ObjectId):
+        return str(data)
+    if isinstance(data, Decimal):
+        return float(data)
+    return data
+
+
+def product_list(count):
+    now = datetime.datetime.utcnow().isoformat()
+    return [{
+        'id': str(ObjectId()), '_id': str(ObjectId()),
+        'name': f'Village product {i}', 'description': 'Fresh from the farm, packed the same day. ' * 4,
+        'price': Decimal('249.00'), 'discount_price': Decimal('199.00'), 'stock': i,
+        'images': [f'/assets/product_{i}.png', f'/assets/product_{i}_2.png'],
+        'category_ids': ['Honey', 'Organic'],
+        'attributes': {'weight': '500g', 'allergens': [], 'batch': ObjectId(), 'packed_at': now},
+        'is_active': True,
+    } for i in range(count)]
+
+
+def page(sections, blocks):
+    return {
+        'id': str(ObjectId()), 'name': 'Home', 'slug': 'home', 'layout': 'default', 'status': 'published',
+        'sections': [{
+            'id': f's{s}', 'layout': 'boxed', 'order': s, 'styles': {'padding': '48px', 'background': '#0a0d08'},
+            'blocks': [{
+                'id': f's{s}b{b}', 'type': 'text',
+                'content': {'text': 'Authentic flavours, delivered to your doorstep. ' * 3, 'ref': ObjectId()},
+                'styles': {'fontSize': '18px', 'color': '#f1f5f9'}, 'animations': {'type': 'fade', 'delay': 0.1},
+                'visibility': {'mobile': True, 'tablet': True, 'desktop': True},
+            } for b in range(blocks)],
+        } for s in range(sections)],
+    }
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+class Command(BaseCommand):
+    help = "Compare JSON encode time and bytes on the wire for the old and new rendering stacks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--sections', type=int, default=20)
+        parser.add_argument('--blocks', type=int, default=25)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        payloads = {
+            f"{options['products']} products": product_list(options['products']),
+            f"page {options['sections']}x{options['blocks']} blocks": page(options['sections'], options['blocks']),
+        }
+        legacy, fast = JSONRenderer(), FastJSONRenderer()
+
+        for name, data in payloads.items():
+            old_ms, body = timed(lambda: legacy.render(legacy_convert(data)), options['repeat'])
+            new_ms, fast_body = timed(lambda: fast.render(data), options['repeat'])
+            gzip_ms, gz = timed(lambda: gzip.compress(fast_body, compresslevel=6), options['repeat'])
+            br_ms, br = timed(lambda: brotli.compress(fast_body, quality=5), options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  DRF JSONRenderer + convert  : {old_ms:8.2f} ms  {len(body):>9} bytes")
+            self.stdout.write(f"  FastJSONRenderer            : {new_ms:8.2f} ms  {len(fast_body):>9} bytes  ({old_ms / new_ms:.1f}x faster)")
+            self.stdout.write(f"  + gzip (once, then cached)  : {gzip_ms:8.2f} ms  {len(gz):>9} bytes")
+            self.stdout.write(f"  + brotli (once, then cached): {br_ms:8.2f} ms  {len(br):>9} bytes")
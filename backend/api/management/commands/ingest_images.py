@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.models import Category, Hero, Product, Story
+
+
+class Command(BaseCommand):
+    help = "Build resized image variants for every product, story, category and hero"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild variant sets already recorded")
+
+    def handle(self, *args, **options):
+        futures = []
+        for model in (Product, Story, Category, Hero):
+            if options['force']:
+                model._get_collection().update_many({}, {'$unset': {'image_variants': ''}})
+            for pk in model.objects.scalar('id'):
+                futures.append(images.executor.submit(images.attach_variants, model, pk))
+
+        total = sum(len(future.result()) for future in futures)
+        self.stdout.write(self.style.SUCCESS(f"Recorded {total} variant sets on {len(futures)} documents"))
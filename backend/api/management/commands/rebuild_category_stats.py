@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import catalog, response_cache
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized product counts and price ranges for every category"
+
+    def handle(self, *args, **options):
+        # The incremental refresh done on product writes relies on this index
+        Product.ensure_indexes()
+        updated = catalog.rebuild_all()
+        response_cache.invalidate('categories')
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {updated} categories"))
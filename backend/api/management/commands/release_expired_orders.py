@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import orders
+from api.models import Order, Product
+
+
+class Command(BaseCommand):
+    help = "Expire unpaid orders past their reservation deadline and return their stock (run from cron)"
+
+    def handle(self, *args, **options):
+        Product.ensure_indexes()
+        Order.ensure_indexes()
+        released = orders.release_expired()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} stock holds"))
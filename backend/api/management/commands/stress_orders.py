@@ -0,0 +1,66 @@
+import threading
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import orders
+from api.models import Order, Product
+
+
+class Command(BaseCommand):
+    help = "Fire concurrent single-item orders at one low-stock product and check nothing is oversold"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=300)
+        parser.add_argument('--stock', type=int, default=5)
+        parser.add_argument('--quantity', type=int, default=1)
+
+    def handle(self, *args, **options):
+        Product.ensure_indexes()
+        # Inactive so the SKU never shows up in the live catalogue; the run
+        # reserves it with include_inactive.
+        product = Product(
+            name="Stress test SKU", price=Decimal('10.00'), stock=options['stock'], is_active=False,
+        )
+        product.save()
+        placed, rejected, failed = [], [], []
+        try:
+            start = threading.Barrier(options['buyers'])
+            lock = threading.Lock()
+
+            def buy():
+                start.wait()
+                try:
+                    order = orders.place_order(
+                        [{'product_id': str(product.id), 'quantity': options['quantity']}],
+                        {'name': 'stress'},
+                        include_inactive=True,
+                    )
+                    result = placed, order.id
+                except orders.OutOfStock:
+                    result = rejected, None
+                except Exception as e:
+                    result = failed, e
+                with lock:
+                    result[0].append(result[1])
+
+            threads = [threading.Thread(target=buy) for _ in range(options['buyers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            product.reload()
+        finally:
+            Order.objects(id__in=placed).delete()
+            product.delete()
+
+        sold = len(placed) * options['quantity']
+        self.stdout.write(
+            f"buyers={options['buyers']} placed={len(placed)} rejected={len(rejected)} "
+            f"errors={len(failed)} stock_left={product.stock}"
+        )
+        if failed:
+            raise CommandError(f"{len(failed)} orders failed unexpectedly: {failed[0]!r}")
+        if product.stock < 0 or sold + product.stock != options['stock']:
+            raise CommandError("Oversold: stock accounting does not add up")
+        self.stdout.write(self.style.SUCCESS("No oversell"))
@@ -0,0 +1,135 @@
+import gzip
+
+import brotli
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import response_cache
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _encode(content):
+    return {
+        'identity': content,
+        'gzip': gzip.compress(content, compresslevel=6),
+        'br': brotli.compress(content, quality=5),
+    }
+
+
+def _accepted_encodings(header):
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name] = q
+    return accepted
+
+
+def _pick_encoding(request, available):
+    accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    best, best_q = 'identity', 0.0
+    for encoding in ('br', 'gzip'):
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in available and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _apply_encoding(response, bodies, encoding):
+    response.content = bodies[encoding]
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(response.content))
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def _is_api_json(request, response):
+    return request.path.startswith('/api/') and response.get('Content-Type', '').startswith('application/json')
+
+
+class CompressedResponseCacheMiddleware:
+    """
+    Caches rendered GET responses of views that set `cache_resource`
+    together with their gzip and brotli encodings, so a repeated hit is a
+    cache lookup that returns precompressed bytes: no query, no
+    serialization, no compression. Other large /api/ JSON responses are
+    compressed on the fly; HTML (admin pages with CSRF tokens) never is.
+
+    Each resource has its own generation in the cache key, bumped by the
+    views that write it (see MongoBaseView.invalidates), so a product edit
+    leaves cached pages and stories alone. Requests carrying credentials
+    bypass the cache so it never answers before authentication runs, and so
+    do query strings with parameters the view does not declare in
+    `cache_query_params`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60)
+        self.min_length = getattr(settings, 'RESPONSE_COMPRESS_MIN_LENGTH', 512)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if request.method not in SAFE_METHODS or getattr(response, '_from_response_cache', False):
+            return response
+        if response.streaming or response.status_code != 200 or response.has_header('Content-Encoding'):
+            return response
+        if not _is_api_json(request, response):
+            return response
+
+        cache_key = getattr(request, '_response_cache_key', None)
+        if cache_key is not None:
+            bodies = _encode(response.content)
+            response_cache.get_cache().set(cache_key, {
+                'content_type': response['Content-Type'],
+                'bodies': bodies,
+            }, self.timeout)
+            return _apply_encoding(response, bodies, _pick_encoding(request, bodies))
+
+        if len(response.content) >= self.min_length:
+            encoding = _pick_encoding(request, ('br', 'gzip'))
+            if encoding == 'br':
+                return _apply_encoding(response, {'br': brotli.compress(response.content, quality=4)}, 'br')
+            if encoding == 'gzip':
+                return _apply_encoding(response, {'gzip': gzip.compress(response.content, compresslevel=6)}, 'gzip')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        resource = getattr(view_class, 'cache_resource', None)
+        if request.method not in SAFE_METHODS or not resource:
+            return None
+        query_params = getattr(view_class, 'cache_query_params', ())
+        if not set(request.GET).issubset(query_params):
+            # Unknown parameters would each get their own entry; serve fresh
+            return None
+        if 'HTTP_AUTHORIZATION' in request.META:
+            # Authenticated callers always go through the view's auth checks
+            return None
+        if 'text/html' in request.META.get('HTTP_ACCEPT', ''):
+            # Browsable API pages are never cached
+            return None
+
+        cache_key = response_cache.cache_key(resource, request, query_params)
+        cached = response_cache.get_cache().get(cache_key)
+        if cached is None:
+            request._response_cache_key = cache_key
+            return None
+
+        response = HttpResponse(content_type=cached['content_type'])
+        response._from_response_cache = True
+        return _apply_encoding(response, cached['bodies'], _pick_encoding(request, cached['bodies']))
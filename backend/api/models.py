@@ -48,7 +48,13 @@ class Category(Document):
     description = fields.StringField()
     media_url = fields.StringField() # image or video
     media_type = fields.StringField(default="image") # image, video
+    image_variants = fields.ListField(fields.DictField()) # resized copies, written by api.images
     is_active = fields.BooleanField(default=True)
+    # Materialized from products by api.catalog; never written by the admin
+    product_count = fields.IntField(default=0)
+    min_price = fields.DecimalField()
+    max_price = fields.DecimalField()
+    stats_updated_at = fields.DateTimeField()
     createdAt = fields.DateTimeField()
     updatedAt = fields.DateTimeField()
     __v = fields.IntField()
@@ -66,7 +72,10 @@ class Product(Document):
     discount_price = fields.DecimalField()
     stock = fields.IntField(default=0)
     images = fields.ListField(fields.StringField())
+    image_variants = fields.ListField(fields.DictField()) # resized copies, written by api.images
     category_ids = fields.ListField(fields.StringField())
+    # Pending order holds, each {order, quantity, expires}; managed by api.orders
+    reservations = fields.ListField(fields.DictField())
     attributes = fields.DictField() # variants, allergens, ingredients, etc.
     is_active = fields.BooleanField(default=True)
     created_at = fields.DateTimeField(default=datetime.datetime.utcnow)
@@ -77,7 +86,9 @@ class Product(Document):
     meta = {
         'collection': 'products',
         'strict': False,
-        'auto_create_index': False
+        'auto_create_index': False,
+        # Created by `manage.py rebuild_category_stats` / `release_expired_orders`
+        'indexes': ['category_ids', 'reservations.expires']
     }
 
 class Coupon(Document):
@@ -117,6 +128,7 @@ class Story(Document):
     subtitle = fields.StringField()
     thumbnailImage = fields.StringField()
     heroImage = fields.StringField()
+    image_variants = fields.ListField(fields.DictField()) # resized copies, written by api.images
     shortExcerpt = fields.StringField()
     fullStoryContent = fields.ListField(fields.DictField())
     is_active = fields.BooleanField(default=True)
@@ -135,6 +147,7 @@ class Hero(Document):
     subtitle = fields.StringField(default="Authentic flavors, delivered to your doorstep")
     description = fields.StringField(default="Experience the taste of tradition with our handpicked selection of village-fresh products")
     backgroundImage = fields.StringField(default="/assets/hero.png")
+    image_variants = fields.ListField(fields.DictField()) # resized copies, written by api.images
     ctaText = fields.StringField(default="Explore Our Products")
     ctaLink = fields.StringField(default="/products")
     secondaryCtaText = fields.StringField(default="Our Story")
@@ -149,3 +162,42 @@ class Hero(Document):
         'strict': False,
         'auto_create_index': False
     }
+
+class AnalyticsRollup(Document):
+    # Written by api.analytics via bulk $inc upserts; one row per kind/key/time bucket
+    kind = fields.StringField(required=True) # product_view, coupon_attempt
+    key = fields.StringField(required=True) # product id or coupon code
+    bucket = fields.DateTimeField(required=True)
+    count = fields.IntField(default=0)
+
+    meta = {
+        'collection': 'analytics_rollups',
+        'strict': False,
+        'indexes': [
+            {'fields': ['kind', 'key', 'bucket'], 'unique': True},
+            ['kind', 'bucket'],
+        ]
+    }
+
+class OrderItem(EmbeddedDocument):
+    product_id = fields.StringField(required=True)
+    name = fields.StringField()
+    price = fields.DecimalField(required=True)
+    quantity = fields.IntField(required=True, min_value=1)
+
+class Order(Document):
+    items = fields.ListField(fields.EmbeddedDocumentField(OrderItem))
+    customer = fields.DictField() # name, phone, address, etc.
+    total = fields.DecimalField(required=True)
+    status = fields.StringField(default="reserved") # reserved, paid, expired, cancelled
+    reserved_until = fields.DateTimeField()
+    created_at = fields.DateTimeField(default=datetime.datetime.utcnow)
+    updated_at = fields.DateTimeField(default=datetime.datetime.utcnow)
+
+    meta = {
+        'collection': 'orders',
+        'strict': False,
+        'indexes': [
+            ['status', 'reserved_until'],
+        ]
+    }
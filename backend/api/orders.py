@@ -0,0 +1,211 @@
+import datetime
+from collections import OrderedDict
+from decimal import Decimal
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import ReturnDocument, UpdateOne
+
+from . import response_cache
+from .models import Order, OrderItem, Product
+
+# How long past `expires` a hold is left alone before the sweeper returns it,
+# so a payment confirmed right at the deadline always wins the race.
+SWEEP_GRACE = datetime.timedelta(seconds=60)
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        super().__init__("Insufficient stock")
+        self.product_ids = product_ids
+
+
+def _merge_lines(lines):
+    quantities = OrderedDict()
+    for line in lines:
+        quantities[line['product_id']] = quantities.get(line['product_id'], 0) + line['quantity']
+    return quantities
+
+
+def _release_ops(order_id, quantities, restock=True):
+    # Each op only matches while the product still carries this order's hold,
+    # so releasing is idempotent and never returns stock that wasn't taken.
+    return [
+        UpdateOne(
+            {'_id': ObjectId(product_id), 'reservations.order': order_id},
+            {
+                **({'$inc': {'stock': quantity}} if restock else {}),
+                '$pull': {'reservations': {'order': order_id}},
+            },
+        )
+        for product_id, quantity in quantities.items()
+    ]
+
+
+def reserve_stock(order_id, quantities, expires, include_inactive=False):
+    """
+    Take stock for every line in one unordered bulk_write of conditional
+    $inc updates. Each update only applies if `stock >= quantity`, so two
+    buyers can never both take the last unit. If any line misses, the lines
+    that did apply are rolled back and OutOfStock names the missing products.
+    """
+    sellable = {} if include_inactive else {'is_active': {'$ne': False}}
+    ops = [
+        UpdateOne(
+            {'_id': ObjectId(product_id), **sellable, 'stock': {'$gte': quantity}},
+            {
+                '$inc': {'stock': -quantity},
+                '$push': {'reservations': {'order': order_id, 'quantity': quantity, 'expires': expires}},
+            },
+        )
+        for product_id, quantity in quantities.items()
+    ]
+    collection = Product._get_collection()
+    result = collection.bulk_write(ops, ordered=False)
+    if result.matched_count == len(ops):
+        return
+
+    collection.bulk_write(_release_ops(order_id, quantities), ordered=False)
+    # Best-effort report of which lines were short; stock may move meanwhile
+    held = {
+        str(doc['_id'])
+        for doc in collection.find({'_id': {'$in': [ObjectId(pk) for pk in quantities]}}, {'stock': 1})
+        if doc.get('stock', 0) >= quantities[str(doc['_id'])]
+    }
+    raise OutOfStock([pk for pk in quantities if pk not in held])
+
+
+def place_order(lines, customer, include_inactive=False):
+    quantities = _merge_lines(lines)
+    products = {str(p.id): p for p in Product.objects(id__in=list(quantities)).only('name', 'price', 'discount_price')}
+    missing = [pk for pk in quantities if pk not in products]
+    if missing:
+        raise OutOfStock(missing)
+
+    order_id = ObjectId()
+    now = datetime.datetime.utcnow()
+    expires = now + datetime.timedelta(minutes=settings.ORDER_RESERVATION_MINUTES)
+    try:
+        reserve_stock(order_id, quantities, expires, include_inactive)
+    except OutOfStock as e:
+        # Abandoned checkouts may be sitting on the short products' stock.
+        # Checking that is a lookup by _id; only then sweep those products
+        # and retry once, so sold-out rejections stay cheap.
+        short = [ObjectId(pk) for pk in e.product_ids]
+        has_stale = Product._get_collection().find_one(
+            {'_id': {'$in': short}, 'reservations.expires': {'$lt': now - SWEEP_GRACE}}, {'_id': 1}
+        )
+        if not has_stale or not release_expired(product_ids=short):
+            raise
+        reserve_stock(order_id, quantities, expires, include_inactive)
+
+    items = []
+    for product_id, quantity in quantities.items():
+        product = products[product_id]
+        price = product.discount_price if product.discount_price is not None else product.price
+        items.append(OrderItem(product_id=product_id, name=product.name, price=price, quantity=quantity))
+
+    order = Order(
+        id=order_id,
+        items=items,
+        customer=customer,
+        total=sum((Decimal(item.price) * item.quantity for item in items), Decimal('0')),
+        status='reserved',
+        reserved_until=expires,
+        created_at=now,
+        updated_at=now,
+    )
+    try:
+        order.save(force_insert=True)
+    except Exception:
+        Product._get_collection().bulk_write(_release_ops(order_id, quantities), ordered=False)
+        raise
+    return order
+
+
+def confirm_payment(order):
+    """Mark a reserved order paid if its hold has not expired yet."""
+    now = datetime.datetime.utcnow()
+    updated = Order._get_collection().update_one(
+        {'_id': order.id, 'status': 'reserved', 'reserved_until': {'$gt': now}},
+        {'$set': {'status': 'paid', 'updated_at': now}},
+    )
+    if not updated.modified_count:
+        return False
+    # Stock stays taken; only the hold markers are dropped
+    quantities = {item.product_id: item.quantity for item in order.items}
+    Product._get_collection().bulk_write(_release_ops(order.id, quantities, restock=False), ordered=False)
+    return True
+
+
+def cancel_order(order):
+    now = datetime.datetime.utcnow()
+    updated = Order._get_collection().update_one(
+        {'_id': order.id, 'status': 'reserved'},
+        {'$set': {'status': 'cancelled', 'updated_at': now}},
+    )
+    if not updated.modified_count:
+        return False
+    quantities = {item.product_id: item.quantity for item in order.items}
+    Product._get_collection().bulk_write(_release_ops(order.id, quantities), ordered=False)
+    return True
+
+
+def release_expired(product_ids=None):
+    """
+    Expire unpaid orders past their deadline and return their stock. Holds
+    are swept from the products themselves, so stock taken by a request
+    that died before saving its order is recovered too. With `product_ids`
+    only those products (and the orders holding them) are swept.
+    """
+    now = datetime.datetime.utcnow()
+    cutoff = now - SWEEP_GRACE
+    product_filter = {'reservations.expires': {'$lt': cutoff}}
+    order_filter = {'status': 'reserved', 'reserved_until': {'$lt': cutoff}}
+    if product_ids is not None:
+        product_filter['_id'] = {'$in': list(product_ids)}
+
+    stale = []
+    for product in Product._get_collection().find(product_filter, {'reservations': 1}):
+        for hold in product['reservations']:
+            if hold['expires'] < cutoff:
+                stale.append((product['_id'], hold))
+    if product_ids is not None:
+        order_filter['_id'] = {'$in': list({hold['order'] for _, hold in stale})}
+    Order._get_collection().update_many(order_filter, {'$set': {'status': 'expired', 'updated_at': now}})
+    if not stale:
+        return 0
+
+    paid = set(Order._get_collection().distinct(
+        '_id', {'_id': {'$in': list({hold['order'] for _, hold in stale})}, 'status': 'paid'}
+    ))
+    ops = [
+        UpdateOne(
+            {'_id': product_id, 'reservations.order': hold['order']},
+            {
+                **({} if hold['order'] in paid else {'$inc': {'stock': hold['quantity']}}),
+                '$pull': {'reservations': {'order': hold['order']}},
+            },
+        )
+        for product_id, hold in stale
+    ]
+    result = Product._get_collection().bulk_write(ops, ordered=False)
+    if result.modified_count:
+        # Covers the cron sweep and the one place_order runs before a retry,
+        # which returns stock even when the order itself is then refused
+        response_cache.invalidate('products')
+    return result.modified_count
+
+
+def adjust_stock(product_id, delta):
+    """
+    Change a product's stock by `delta` in one atomic $inc, refusing to go
+    below zero. Admin stock edits go through here rather than a full PUT so
+    units sold while the editor was open are never written back.
+    """
+    condition = {'stock': {'$gte': -delta}} if delta < 0 else {}
+    return Product._get_collection().find_one_and_update(
+        {'_id': ObjectId(product_id), **condition},
+        {'$inc': {'stock': delta}},
+        return_document=ReturnDocument.AFTER,
+    )
@@ -0,0 +1,238 @@
+"""
+Single-pass validation for page write payloads. The schema is derived from
+the writable fields PageSerializer declares and compiled into closures, so
+the fast path accepts and rejects what DRF and the Page document would.
+Errors are keyed by path, e.g. ``sections[3].blocks[12].type``.
+"""
+import copy
+import re
+from collections.abc import Mapping
+
+from django.core.validators import ProhibitNullCharactersValidator
+from rest_framework import serializers
+from rest_framework.fields import ProhibitSurrogateCharactersValidator, _UnvalidatedField, empty
+from rest_framework.settings import api_settings
+
+# mongoengine's DictField.validate messages; the compiled path writes raw
+# documents, so it has to apply those checks itself.
+KEY_NOT_STRING = "Invalid dictionary key - documents must have only string keys"
+KEY_STARTS_WITH_DOLLAR = 'Invalid dictionary key name - keys may not startswith "$" characters'
+
+NULL_CHARACTERS = ProhibitNullCharactersValidator.message
+SURROGATE_CHARACTERS = ProhibitSurrogateCharactersValidator.message
+SURROGATE_RE = re.compile('[\ud800-\udfff]')
+# Validators CharField always adds, and which _coerce_str applies inline
+STRING_VALIDATORS = (ProhibitNullCharactersValidator, ProhibitSurrogateCharactersValidator)
+
+
+class Invalid(Exception):
+    pass
+
+
+def _type_name(value):
+    return type(value).__name__
+
+
+def _bad_key(value):
+    # Same recursion as mongoengine: into nested dicts, not into lists
+    for key, item in value.items():
+        if not isinstance(key, str):
+            return KEY_NOT_STRING
+        if key.startswith('$'):
+            return KEY_STARTS_WITH_DOLLAR
+        if isinstance(item, dict):
+            problem = _bad_key(item)
+            if problem:
+                return problem
+    return None
+
+
+def _coerce_str(value, options):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise Invalid(options['messages']['invalid'])
+    value = str(value)
+    if options['trim_whitespace']:
+        value = value.strip()
+    if not value and not options['allow_blank']:
+        raise Invalid(options['messages']['blank'])
+    if '\x00' in value:
+        raise Invalid(NULL_CHARACTERS)
+    surrogate = SURROGATE_RE.search(value)
+    if surrogate:
+        raise Invalid(SURROGATE_CHARACTERS.format(code_point=ord(surrogate.group())))
+    return value
+
+
+def _coerce_int(value, options):
+    # Exactly IntegerField.to_internal_value: no float round trip, so large
+    # integers keep every digit.
+    if isinstance(value, str) and len(value) > options['max_string_length']:
+        raise Invalid(options['messages']['max_string_length'])
+    try:
+        return int(options['re_decimal'].sub('', str(value)))
+    except (ValueError, TypeError):
+        raise Invalid(options['messages']['invalid'])
+
+
+def _coerce_bool(value, options):
+    if isinstance(value, str):
+        value = value.lower()
+    try:
+        if value in options['true_values']:
+            return True
+        if value in options['false_values']:
+            return False
+    except TypeError:
+        pass
+    raise Invalid(options['messages']['invalid'])
+
+
+def _coerce_dict(value, options):
+    if not isinstance(value, dict):
+        raise Invalid(options['messages']['not_a_dict'].format(input_type=_type_name(value)))
+    value = {str(key): item for key, item in value.items()}
+    problem = _bad_key(value)
+    if problem:
+        raise Invalid(problem)
+    return value
+
+
+COERCERS = {
+    'str': _coerce_str,
+    'int': _coerce_int,
+    'bool': _coerce_bool,
+    'dict': _coerce_dict,
+}
+
+
+def _scalar(coerce, options):
+    return lambda value, path, errors: coerce(value, options)
+
+
+def _list(item_validator, options):
+    def check(value, path, errors):
+        if not isinstance(value, list):
+            raise Invalid(options['messages']['not_a_list'].format(input_type=_type_name(value)))
+        return [item_validator(item, f'{path}[{index}]', errors) for index, item in enumerate(value)]
+    return check
+
+
+def _unsupported(name, reason):
+    return TypeError(f"Cannot compile field {name!r}: {reason}")
+
+
+def _field_spec(name, field):
+    """Translate one DRF field into a (kind, options) spec."""
+    if field.source != name:
+        raise _unsupported(name, "source differs from the field name")
+    if field.allow_null:
+        raise _unsupported(name, "allow_null is not supported")
+    if field.default is not empty and callable(field.default):
+        raise _unsupported(name, "callable defaults are not supported")
+
+    options = {
+        'required': field.required,
+        'default': field.default,
+        'messages': field.error_messages,
+    }
+    if isinstance(field, serializers.ListSerializer):
+        if not field.allow_empty or field.max_length is not None or field.min_length is not None:
+            raise _unsupported(name, "list length constraints are not supported")
+        if not isinstance(field.child, serializers.Serializer):
+            raise _unsupported(name, "only lists of nested serializers are supported")
+        return 'list', {
+            **options,
+            'schema': schema_from_serializer(field.child),
+            'schema_messages': field.child.error_messages,
+        }
+    if isinstance(field, serializers.Serializer):
+        return 'object', {**options, 'schema': schema_from_serializer(field)}
+
+    if any(not isinstance(validator, STRING_VALIDATORS) for validator in field.validators):
+        raise _unsupported(name, "extra validators are not supported")
+    if type(field) is serializers.CharField:
+        return 'str', {**options, 'allow_blank': field.allow_blank, 'trim_whitespace': field.trim_whitespace}
+    if type(field) is serializers.IntegerField:
+        return 'int', {**options, 're_decimal': field.re_decimal, 'max_string_length': field.MAX_STRING_LENGTH}
+    if type(field) is serializers.BooleanField:
+        return 'bool', {**options, 'true_values': field.TRUE_VALUES, 'false_values': field.FALSE_VALUES}
+    if type(field) is serializers.DictField:
+        if not isinstance(field.child, _UnvalidatedField) or not field.allow_empty:
+            raise _unsupported(name, "only unvalidated, possibly empty dicts are supported")
+        return 'dict', options
+    raise _unsupported(name, f"{type(field).__name__} is not supported")
+
+
+def schema_from_serializer(serializer):
+    """Derive a {name: spec} schema from a serializer's writable fields."""
+    serializer_class = type(serializer)
+    if serializer_class.validate is not serializers.Serializer.validate:
+        raise _unsupported(serializer_class.__name__, "custom validate() is not supported")
+    schema = {}
+    for name, field in serializer.fields.items():
+        if field.read_only:
+            continue
+        if hasattr(serializer, f'validate_{name}'):
+            raise _unsupported(name, "validate_<field> methods are not supported")
+        schema[name] = _field_spec(name, field)
+    return schema
+
+
+def compile_schema(schema, messages):
+    """Compile a {name: spec} schema into a validator(data, path, errors) closure."""
+    fields = []
+    for name, (kind, options) in schema.items():
+        if kind == 'list':
+            check = _list(compile_schema(options['schema'], options['schema_messages']), options)
+        elif kind == 'object':
+            check = compile_schema(options['schema'], options['messages'])
+        else:
+            check = _scalar(COERCERS[kind], options)
+        default = options['default']
+        # Mutable defaults are copied per payload so documents never share them
+        needs_copy = isinstance(default, (dict, list))
+        fields.append((name, check, options['required'], default, needs_copy, options['messages']))
+
+    def validate(data, path, errors):
+        if data is None:
+            errors[path or api_settings.NON_FIELD_ERRORS_KEY] = [str(messages['null'])]
+            return None
+        if not isinstance(data, Mapping):
+            message = messages['invalid'].format(datatype=_type_name(data))
+            errors[path or api_settings.NON_FIELD_ERRORS_KEY] = [message]
+            return None
+        result = {}
+        for name, check, required, default, needs_copy, field_messages in fields:
+            field_path = f'{path}.{name}' if path else name
+            value = data.get(name, empty)
+            if value is empty:
+                if required:
+                    errors[field_path] = [str(field_messages['required'])]
+                elif default is not empty:
+                    result[name] = copy.deepcopy(default) if needs_copy else default
+            elif value is None:
+                errors[field_path] = [str(field_messages['null'])]
+            else:
+                try:
+                    result[name] = check(value, field_path, errors)
+                except Invalid as e:
+                    errors[field_path] = [str(e)]
+        return result
+
+    return validate
+
+
+def compile_serializer(serializer):
+    """
+    Compile `serializer`'s writable fields into validate(data) returning
+    (validated_data, errors); errors maps dotted paths to messages. Raises
+    TypeError for fields the compiler cannot reproduce exactly.
+    """
+    validate = compile_schema(schema_from_serializer(serializer), serializer.error_messages)
+
+    def validate_data(data):
+        errors = {}
+        validated = validate(data, '', errors)
+        return validated, errors
+
+    return validate_data
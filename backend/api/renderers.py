@@ -0,0 +1,44 @@
+import datetime
+from decimal import Decimal
+
+import orjson
+from bson import ObjectId
+from rest_framework.renderers import BaseRenderer
+
+
+def _default(obj):
+    # Types orjson doesn't know natively; datetimes and UUIDs it handles itself
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    raise TypeError
+
+
+def dumps(data, indent=False):
+    option = orjson.OPT_NON_STR_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(data, default=_default, option=option)
+
+
+class FastJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer backed by orjson. Mongo
+    values (ObjectId, Decimal) are encoded directly, so serializers can hand
+    over raw document data without converting it first.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = False
+        if accepted_media_type:
+            # Honour `Accept: application/json; indent=4` like JSONRenderer
+            indent = 'indent=' in accepted_media_type
+        return dumps(data, indent=indent)
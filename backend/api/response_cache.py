@@ -0,0 +1,41 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def get_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def _generation_key(resource):
+    return f'response-cache:generation:{resource}'
+
+
+def generation(resource):
+    cache = get_cache()
+    key = _generation_key(resource)
+    value = cache.get(key)
+    if value is None:
+        # Seeded from the clock so a lost counter never reuses old keys
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def invalidate(*resources):
+    """Drop every cached response of the given resources (e.g. 'products')."""
+    cache = get_cache()
+    for resource in resources:
+        try:
+            cache.incr(_generation_key(resource))
+        except ValueError:
+            cache.set(_generation_key(resource), time.time_ns(), None)
+
+
+def cache_key(resource, request, query_params=()):
+    # Only parameters the view reads are part of the key, in a fixed order,
+    # so arbitrary query strings cannot mint new entries
+    query = urlencode([(name, value) for name in sorted(query_params) for value in request.GET.getlist(name)])
+    return f'response-cache:{resource}:{generation(resource)}:{request.path}?{query}'
@@ -1,23 +1,16 @@
 from rest_framework import serializers
-from .models import Page, Section, Block, Product, Category, Coupon, Theme, Story, Hero
+from rest_framework.fields import empty
+from .models import Page, Product, Category, Coupon, Theme, Story, Hero
+from . import catalog, images, page_schema
 from bson import ObjectId
-from decimal import Decimal
+from pymongo.errors import DuplicateKeyError
+import datetime
+import mongoengine
 
 class MongoSerializer(serializers.Serializer):
-    def to_representation(self, instance):
-        ret = super().to_representation(instance)
-        return self._convert_types(ret)
-
-    def _convert_types(self, data):
-        if isinstance(data, list):
-            return [self._convert_types(item) for item in data]
-        elif isinstance(data, dict):
-            return {k: self._convert_types(v) for k, v in data.items()}
-        elif isinstance(data, ObjectId):
-            return str(data)
-        elif isinstance(data, Decimal):
-            return float(data)
-        return data
+    # ObjectId and Decimal values are left as-is; api.renderers.FastJSONRenderer
+    # encodes them directly instead of walking every payload to convert them.
+    pass
 
 class BlockSerializer(MongoSerializer):
     id = serializers.CharField()
@@ -47,38 +40,40 @@ class PageSerializer(MongoSerializer):
     sections = SectionSerializer(many=True, required=False, default=[])
     version = serializers.IntegerField(default=1)
     
+    def run_validation(self, data=empty):
+        # Full writes go through the compiled page schema in one pass instead
+        # of DRF's field-by-field walk of every section and block.
+        if self.partial:
+            return super().run_validation(data)
+        validated_data, errors = validate_page(data)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return validated_data
+
+    # validated_data is already in stored form, so both writes go straight to
+    # the collection and skip rebuilding and re-validating Section/Block docs.
     def create(self, validated_data):
-        sections_data = validated_data.pop('sections', [])
-        page = Page(**validated_data)
-        
-        sections = []
-        for section_data in sections_data:
-            blocks_data = section_data.pop('blocks', [])
-            section = Section(**section_data)
-            section.blocks = [Block(**b) for b in blocks_data]
-            sections.append(section)
-        
-        page.sections = sections
-        page.save()
-        return page
+        now = datetime.datetime.utcnow()
+        son = {**validated_data, 'created_at': now, 'updated_at': now}
+        try:
+            Page._get_collection().insert_one(son)
+        except DuplicateKeyError as e:
+            raise mongoengine.errors.NotUniqueError(str(e))
+        return Page._from_son(son)
 
     def update(self, instance, validated_data):
-        sections_data = validated_data.pop('sections', [])
-        
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-            
-        sections = []
-        for section_data in sections_data:
-            blocks_data = section_data.pop('blocks', [])
-            section = Section(**section_data)
-            section.blocks = [Block(**b) for b in blocks_data]
-            sections.append(section)
-            
-        instance.sections = sections
-        instance.save()
+        son = {**validated_data, 'updated_at': datetime.datetime.utcnow()}
+        try:
+            Page._get_collection().update_one({'_id': instance.id}, {'$set': son})
+        except DuplicateKeyError as e:
+            raise mongoengine.errors.NotUniqueError(str(e))
+        for attr, value in son.items():
+            setattr(instance, attr, Page._fields[attr].to_python(value))
         return instance
 
+# Compiled once from PageSerializer's own fields, so the two paths cannot drift
+validate_page = page_schema.compile_serializer(PageSerializer())
+
 class CategorySerializer(MongoSerializer):
     id = serializers.CharField(read_only=True)
     _id = serializers.CharField(source='id', read_only=True)
@@ -88,9 +83,27 @@ class CategorySerializer(MongoSerializer):
     media_url = serializers.CharField(required=False, allow_blank=True)
     media_type = serializers.CharField(default="image")
     is_active = serializers.BooleanField(default=True)
+    product_count = serializers.IntegerField(read_only=True)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    image_variants = serializers.ListField(child=serializers.DictField(), read_only=True)
 
     def create(self, validated_data):
-        return Category.objects.create(**validated_data)
+        category = Category.objects.create(**validated_data)
+        # Products may already reference the new category by name or slug
+        catalog.refresh_categories([category])
+        images.schedule_variants(category)
+        category.reload()
+        return category
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
+        catalog.refresh_categories([instance])
+        images.schedule_variants(instance)
+        instance.reload()
+        return instance
 
 class ProductSerializer(MongoSerializer):
     id = serializers.CharField(read_only=True)
@@ -104,9 +117,25 @@ class ProductSerializer(MongoSerializer):
     category_ids = serializers.ListField(child=serializers.CharField())
     attributes = serializers.DictField()
     is_active = serializers.BooleanField(default=True)
+    image_variants = serializers.ListField(child=serializers.DictField(), read_only=True)
 
     def create(self, validated_data):
-        return Product.objects.create(**validated_data)
+        product = Product.objects.create(**validated_data)
+        catalog.refresh_for_product_change(new_refs=product.category_ids)
+        images.schedule_variants(product)
+        return product
+
+    def update(self, instance, validated_data):
+        # Stock is also decremented by orders, so writing back the editor's
+        # copy would lose sales; it only changes via orders.adjust_stock.
+        validated_data.pop('stock', None)
+        old_refs = list(instance.category_ids)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
+        catalog.refresh_for_product_change(old_refs, instance.category_ids)
+        images.schedule_variants(instance)
+        return instance
 
 class CouponSerializer(MongoSerializer):
     id = serializers.CharField(read_only=True)
@@ -121,6 +150,10 @@ class CouponSerializer(MongoSerializer):
     is_active = serializers.BooleanField(default=True)
     applied_to = serializers.DictField()
 
+    def validate_code(self, value):
+        # Stored upper-cased so lookups can match exactly on the unique index
+        return value.upper()
+
     def create(self, validated_data):
         return Coupon.objects.create(**validated_data)
 
@@ -145,6 +178,19 @@ class StorySerializer(MongoSerializer):
     shortExcerpt = serializers.CharField(required=False, allow_blank=True)
     fullStoryContent = serializers.ListField(child=serializers.DictField())
     is_active = serializers.BooleanField(default=True)
+    image_variants = serializers.ListField(child=serializers.DictField(), read_only=True)
+
+    def create(self, validated_data):
+        story = Story.objects.create(**validated_data)
+        images.schedule_variants(story)
+        return story
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save()
+        images.schedule_variants(instance)
+        return instance
 
 class HeroSerializer(MongoSerializer):
     id = serializers.CharField(read_only=True)
@@ -158,12 +204,37 @@ class HeroSerializer(MongoSerializer):
     secondaryCtaText = serializers.CharField(required=False, allow_blank=True)
     secondaryCtaLink = serializers.CharField(required=False, allow_blank=True)
     is_active = serializers.BooleanField(default=True)
+    image_variants = serializers.ListField(child=serializers.DictField(), read_only=True)
 
     def create(self, validated_data):
-        return Hero.objects.create(**validated_data)
+        hero = Hero.objects.create(**validated_data)
+        images.schedule_variants(hero)
+        return hero
 
     def update(self, instance, validated_data):
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
+        images.schedule_variants(instance)
         return instance
+
+class OrderItemSerializer(MongoSerializer):
+    product_id = serializers.CharField()
+    name = serializers.CharField(read_only=True)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    quantity = serializers.IntegerField(min_value=1)
+
+    def validate_product_id(self, value):
+        if not ObjectId.is_valid(value):
+            raise serializers.ValidationError("Not a valid product id.")
+        return value
+
+class OrderSerializer(MongoSerializer):
+    id = serializers.CharField(read_only=True)
+    _id = serializers.CharField(source='id', read_only=True)
+    items = OrderItemSerializer(many=True, allow_empty=False)
+    customer = serializers.DictField(required=False, default={})
+    total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    status = serializers.CharField(read_only=True)
+    reserved_until = serializers.DateTimeField(read_only=True)
+    created_at = serializers.DateTimeField(read_only=True)
@@ -1,3 +1,717 @@
-from django.test import TestCase
+import copy
+import datetime
+import inspect
+import io
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+import mongoengine
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from bson import ObjectId
+from PIL import Image
+from django.test import SimpleTestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from . import analytics, catalog, images, orders, response_cache
+from .models import AnalyticsRollup, Category, Coupon, Hero, Order, Page, Product
+from .serializers import CategorySerializer, PageSerializer, ProductSerializer, validate_page
+
+try:
+    import mongomock
+    from mongomock.collection import BulkOperationBuilder
+except ImportError:
+    mongomock = None
+
+# Point at a disposable database to run against a real server (needed for
+# the concurrency test); otherwise an in-memory mongomock client is used.
+MONGODB_TEST_URI = os.environ.get('MONGODB_TEST_URI')
+
+
+class MongoTestCase(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not MONGODB_TEST_URI and mongomock is None:
+            raise unittest.SkipTest("Set MONGODB_TEST_URI or install mongomock")
+        mongoengine.disconnect()
+        if MONGODB_TEST_URI:
+            mongoengine.connect(host=MONGODB_TEST_URI)
+        else:
+            mongoengine.connect('test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+            if 'sort' not in inspect.signature(BulkOperationBuilder.add_update).parameters:
+                # pymongo >= 4.9 passes UpdateOne's sort= into bulk builders,
+                # which mongomock 4.3 does not accept; none of our ops sort.
+                add_update = BulkOperationBuilder.add_update
+
+                def add_update_without_sort(builder, *args, sort=None, **kwargs):
+                    assert sort is None, "mongomock cannot apply UpdateOne(sort=...)"
+                    return add_update(builder, *args, **kwargs)
+
+                patcher = mock.patch.object(BulkOperationBuilder, 'add_update', add_update_without_sort)
+                patcher.start()
+                cls.addClassCleanup(patcher.stop)
+
+    @classmethod
+    def tearDownClass(cls):
+        mongoengine.disconnect()
+        super().tearDownClass()
+
+    def setUp(self):
+        for model in (Product, Order, Page, Category, Coupon, Hero, AnalyticsRollup):
+            model.drop_collection()
+
+    def make_product(self, stock, **kwargs):
+        product = Product(name="Honey", price=Decimal('250.00'), stock=stock, **kwargs)
+        product.save()
+        return product
+
+    def line(self, product, quantity):
+        return {'product_id': str(product.id), 'quantity': quantity}
+
+    def staff_client(self):
+        client = APIClient()
+        client.force_authenticate(User(username='staff', is_staff=True))
+        return client
+
+
+class OrderReservationTests(MongoTestCase):
+    def test_reserve_takes_stock_and_records_hold(self):
+        product = self.make_product(stock=5)
+        order = orders.place_order([self.line(product, 2)], {})
+
+        product.reload()
+        self.assertEqual(product.stock, 3)
+        self.assertEqual([h['order'] for h in product.reservations], [order.id])
+        self.assertEqual(order.status, 'reserved')
+        self.assertEqual(order.total, Decimal('500.00'))
+
+    def test_short_line_rolls_back_the_others(self):
+        plenty = self.make_product(stock=5)
+        scarce = self.make_product(stock=1)
+
+        with self.assertRaises(orders.OutOfStock) as raised:
+            orders.place_order([self.line(plenty, 2), self.line(scarce, 2)], {})
+
+        self.assertEqual(raised.exception.product_ids, [str(scarce.id)])
+        plenty.reload()
+        scarce.reload()
+        self.assertEqual((plenty.stock, plenty.reservations), (5, []))
+        self.assertEqual((scarce.stock, scarce.reservations), (1, []))
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_inactive_product_is_not_sold(self):
+        product = self.make_product(stock=5, is_active=False)
+        with self.assertRaises(orders.OutOfStock):
+            orders.place_order([self.line(product, 1)], {})
+
+    def test_confirm_keeps_stock_and_drops_hold(self):
+        product = self.make_product(stock=2)
+        order = orders.place_order([self.line(product, 2)], {})
+
+        self.assertTrue(orders.confirm_payment(order))
+        self.assertFalse(orders.confirm_payment(order))
+        product.reload()
+        self.assertEqual((product.stock, product.reservations), (0, []))
+        self.assertEqual(Order.objects.get(id=order.id).status, 'paid')
+
+    def test_cancel_returns_stock(self):
+        product = self.make_product(stock=2)
+        order = orders.place_order([self.line(product, 2)], {})
+
+        self.assertTrue(orders.cancel_order(order))
+        self.assertFalse(orders.cancel_order(order))
+        product.reload()
+        self.assertEqual((product.stock, product.reservations), (2, []))
+        self.assertEqual(Order.objects.get(id=order.id).status, 'cancelled')
+
+    def expire(self, product, order):
+        past = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        Product._get_collection().update_one({'_id': product.id}, {'$set': {'reservations.0.expires': past}})
+        Order._get_collection().update_one({'_id': order.id}, {'$set': {'reserved_until': past}})
+
+    def test_release_expired_returns_stock_and_expires_order(self):
+        product = self.make_product(stock=3)
+        order = orders.place_order([self.line(product, 3)], {})
+        self.expire(product, order)
+
+        self.assertEqual(orders.release_expired(), 1)
+        product.reload()
+        self.assertEqual((product.stock, product.reservations), (3, []))
+        self.assertEqual(Order.objects.get(id=order.id).status, 'expired')
+        self.assertFalse(orders.confirm_payment(order))
+
+    def test_short_product_with_expired_hold_is_reclaimed(self):
+        product = self.make_product(stock=1)
+        stale = orders.place_order([self.line(product, 1)], {})
+        self.expire(product, stale)
+
+        order = orders.place_order([self.line(product, 1)], {})
+        product.reload()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual([h['order'] for h in product.reservations], [order.id])
+        self.assertEqual(Order.objects.get(id=stale.id).status, 'expired')
+
+    def test_admin_put_does_not_overwrite_sold_stock(self):
+        product = self.make_product(stock=5)
+        editor_copy = ProductSerializer(product).data
+        orders.place_order([self.line(product, 3)], {})
+
+        product.reload()
+        serializer = ProductSerializer(product, data={**editor_copy, 'description': 'Fixed typo'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+        product.reload()
+        self.assertEqual(product.stock, 2)
+
+    def test_adjust_stock_never_goes_negative(self):
+        product = self.make_product(stock=2)
+        self.assertEqual(orders.adjust_stock(str(product.id), 3)['stock'], 5)
+        self.assertIsNone(orders.adjust_stock(str(product.id), -6))
+        self.assertEqual(orders.adjust_stock(str(product.id), -5)['stock'], 0)
+
+    def test_confirm_and_listing_require_staff(self):
+        product = self.make_product(stock=1)
+        order = orders.place_order([self.line(product, 1)], {})
+        client = APIClient()
+
+        self.assertEqual(client.post(f'/api/orders/{order.id}/confirm/').status_code, 401)
+        self.assertEqual(client.get('/api/orders/').status_code, 401)
+        self.assertEqual(Order.objects.get(id=order.id).status, 'reserved')
+
+    def test_only_staff_see_an_orders_customer(self):
+        product = self.make_product(stock=1)
+        order = orders.place_order([self.line(product, 1)], {'name': 'Asha', 'phone': '98765'})
+
+        public = APIClient().get(f'/api/orders/{order.id}/').json()
+        self.assertEqual(public['status'], 'reserved')
+        self.assertEqual(len(public['items']), 1)
+        self.assertNotIn('customer', public)
+        staff = self.staff_client().get(f'/api/orders/{order.id}/').json()
+        self.assertEqual(staff['customer']['phone'], '98765')
+
+    def test_stock_adjustments_require_staff(self):
+        product = self.make_product(stock=4)
+        url = f'/api/products/{product.id}/stock/'
+
+        self.assertEqual(APIClient().post(url, {'delta': -4}, format='json').status_code, 401)
+        response = self.staff_client().post(url, {'delta': -1}, format='json')
+        self.assertEqual((response.status_code, response.json()['stock']), (200, 3))
+        self.assertEqual(self.staff_client().post(url, {'delta': -4}, format='json').status_code, 409)
+
+    @unittest.skipUnless(MONGODB_TEST_URI, "needs a real MongoDB for atomic concurrent updates")
+    def test_concurrent_buyers_never_oversell(self):
+        product = self.make_product(stock=5)
+        buyers = 300
+        barrier = threading.Barrier(buyers)
+        placed = []
+
+        def buy():
+            barrier.wait()
+            try:
+                placed.append(orders.place_order([self.line(product, 1)], {}).id)
+            except orders.OutOfStock:
+                pass
+
+        threads = [threading.Thread(target=buy) for _ in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.reload()
+        self.assertEqual(len(placed), 5)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(len(set(placed)), 5)
+        self.assertTrue(all(isinstance(pk, ObjectId) for pk in placed))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ResponseCacheTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        response_cache.get_cache().clear()
+        for i in range(20):
+            Product(name=f"Product {i}", price=Decimal('10.00'), stock=3).save()
+        self.client = APIClient()
+
+    def get_products(self, **headers):
+        return self.client.get('/api/products/', HTTP_ACCEPT='application/json', **headers)
+
+    def test_repeat_hit_is_served_precompressed_from_cache(self):
+        first = self.get_products(HTTP_ACCEPT_ENCODING='gzip, br')
+        second = self.get_products(HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['Content-Encoding'], 'br')
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertTrue(getattr(second, '_from_response_cache', False))
+
+    def test_zero_q_values_are_respected(self):
+        self.get_products()
+        response = self.get_products(HTTP_ACCEPT_ENCODING='br;q=0, gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_requests_with_credentials_bypass_the_cache(self):
+        self.get_products()
+        response = self.get_products(HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+
+    def test_writes_only_invalidate_their_resources(self):
+        self.get_products()
+        self.client.post('/api/pages/', {'name': 'About', 'slug': 'about'}, format='json')
+        self.assertTrue(getattr(self.get_products(), '_from_response_cache', False))
+
+        product_id = self.get_products().json()[0]['_id']
+        self.staff_client().post(f'/api/products/{product_id}/stock/', {'delta': 1}, format='json')
+        self.assertFalse(getattr(self.get_products(), '_from_response_cache', False))
+
+    def cached(self, **params):
+        return getattr(self.client.get('/api/products/', params, HTTP_ACCEPT='application/json'), '_from_response_cache', False)
+
+    def test_stock_changes_from_orders_invalidate_products(self):
+        product = Product.objects.first()
+        self.cached()
+        response = self.client.post('/api/orders/', {'items': [{'product_id': str(product.id), 'quantity': 3}]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        listing = self.get_products()
+        self.assertFalse(getattr(listing, '_from_response_cache', False))
+        self.assertEqual(next(p['stock'] for p in listing.json() if p['_id'] == str(product.id)), 0)
+
+        self.assertTrue(self.cached())
+        self.staff_client().post(f"/api/orders/{response.json()['_id']}/cancel/")
+        self.assertFalse(self.cached())
+
+    def test_expired_hold_sweep_invalidates_products(self):
+        product = Product.objects.first()
+        order = orders.place_order([self.line(product, 1)], {})
+        past = datetime.datetime.utcnow() - datetime.timedelta(hours=1)
+        Product._get_collection().update_one({'_id': product.id}, {'$set': {'reservations.0.expires': past}})
+        self.cached()
+        self.assertTrue(self.cached())
+
+        call_command('release_expired_orders', stdout=io.StringIO())
+        self.assertFalse(self.cached())
+        self.assertEqual(Order.objects.get(id=order.id).status, 'reserved')
+
+    def test_unknown_query_parameters_bypass_the_cache(self):
+        self.cached()
+        self.assertFalse(self.cached(x='1'))
+        self.assertFalse(self.cached(x='1'))
+        self.assertTrue(self.cached())
+
+    def test_html_is_never_compressed(self):
+        response = self.client.get('/admin/login/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+def flatten_errors(detail, path=''):
+    # DRF nests errors per serializer and list index; the compiled page
+    # validator reports the same messages under dotted paths.
+    flat = {}
+    if isinstance(detail, dict):
+        for key, value in detail.items():
+            if isinstance(key, int):
+                key_path = f'{path}[{key}]'
+            elif key == 'non_field_errors' and path:
+                key_path = path
+            else:
+                key_path = f'{path}.{key}' if path else key
+            flat.update(flatten_errors(value, key_path))
+    elif all(isinstance(item, str) for item in detail):
+        if detail:
+            flat[path or 'non_field_errors'] = [str(item) for item in detail]
+    else:
+        for index, item in enumerate(detail):
+            flat.update(flatten_errors(item, f'{path}[{index}]'))
+    return flat
+
+
+def block(**overrides):
+    return {'id': 'b1', 'type': 'text', 'content': {'text': 'Hi'}, **overrides}
+
+
+def section(**overrides):
+    return {'id': 's1', 'layout': 'boxed', 'blocks': [block()], **overrides}
+
+
+def page(**overrides):
+    return {'name': 'Home', 'slug': 'home', 'sections': [section()], **overrides}
+
+
+class PageSchemaParityTests(SimpleTestCase):
+    payloads = [
+        page(),
+        {'name': 'Bare', 'slug': 'bare'},
+        page(version='7', is_active='No', status=' published '),
+        page(version='3.000', meta_title=''),
+        page(version=4.0),
+        page(version=4.5),
+        page(version=True),
+        page(version='1e3'),
+        page(version='9007199254740993'),
+        page(version='1' * 1001),
+        page(name='', slug='   '),
+        page(name=None, is_active='maybe'),
+        page(name=['x'], slug=12),
+        page(name='Nul\x00l'),
+        page(name='\ud800'),
+        page(sections={'id': 's1'}),
+        page(sections=[None, 'text', section(order='x', blocks='none')]),
+        page(sections=[section(styles=[], blocks=[block(id=None, type=''), None, block(content='x')])]),
+        page(sections=[section(blocks=[block(content={'$where': 1})])]),
+        page(sections=[section(styles={'a': {'$set': 1}})]),
+        page(sections=[section(blocks=[block(visibility={1: True})])]),
+        {},
+        [],
+        None,
+        'page',
+    ]
+
+    def reference_validate(self, data):
+        # The path the compiled validator replaces: DRF's field-by-field walk,
+        # then mongoengine validating the Page document before it is saved.
+        try:
+            validated = serializers.Serializer.run_validation(PageSerializer(), data)
+        except serializers.ValidationError as e:
+            detail = e.detail if isinstance(e.detail, dict) else {'non_field_errors': e.detail}
+            return None, flatten_errors(detail), False
+        try:
+            Page._from_son(copy.deepcopy(validated)).validate()
+        except mongoengine.ValidationError:
+            return None, {}, True
+        return validated, {}, False
+
+    def test_compiled_path_matches_drf_and_the_document(self):
+        for payload in self.payloads:
+            with self.subTest(payload=payload):
+                expected, drf_errors, document_rejects = self.reference_validate(payload)
+                data, errors = validate_page(payload)
+                if drf_errors:
+                    self.assertEqual(errors, drf_errors)
+                elif document_rejects:
+                    self.assertTrue(errors)
+                else:
+                    self.assertEqual(errors, {})
+                    self.assertEqual(data, expected)
+
+    def test_large_integers_keep_every_digit(self):
+        data, errors = validate_page(page(version='9007199254740993'))
+        self.assertEqual(errors, {})
+        self.assertEqual(data['version'], 9007199254740993)
+
+    def test_rejects_what_the_page_document_would(self):
+        cases = {
+            'sections[0].blocks[0].content': block(content={'nested': {'$where': 'sleep(1)'}}),
+            'sections[0].blocks[0].id': block(id='b\x00'),
+        }
+        for path, bad_block in cases.items():
+            with self.subTest(path=path):
+                data, errors = validate_page(page(sections=[section(blocks=[bad_block])]))
+                self.assertEqual(list(errors), [path])
+
+    def test_defaults_are_not_shared_between_payloads(self):
+        first, _ = validate_page(page(sections=[section(blocks=[{'id': 'b', 'type': 't'}])]))
+        second, _ = validate_page(page(sections=[section(blocks=[{'id': 'b', 'type': 't'}])]))
+        first['sections'][0]['blocks'][0]['visibility']['mobile'] = False
+        self.assertTrue(second['sections'][0]['blocks'][0]['visibility']['mobile'])
+
+
+class CounterBufferTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buffer = analytics.CounterBuffer(flush_threshold=3)
+        # Flushes are driven by hand; no background flusher thread
+        patcher = mock.patch.object(self.buffer, '_ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rows(self):
+        return {
+            (row['kind'], row['key']): row
+            for row in AnalyticsRollup._get_collection().find({}, {'_id': 0, 'bucket': 0})
+        }
+
+    def test_flush_aggregates_per_kind_key_and_bucket(self):
+        for _ in range(3):
+            self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'b')
+        self.buffer.increment(analytics.COUPON_ATTEMPT, 'a')
+        self.buffer.increment(analytics.COUPON_ATTEMPT, 'a', field='applied')
+
+        self.assertEqual(self.buffer.flush(), 3)
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.flush(), 0)
+
+        rows = self.rows()
+        self.assertEqual(rows[(analytics.PRODUCT_VIEW, 'a')]['count'], 4)
+        self.assertEqual(rows[(analytics.PRODUCT_VIEW, 'b')]['count'], 1)
+        self.assertEqual(rows[(analytics.COUPON_ATTEMPT, 'a')]['applied'], 1)
+        self.assertEqual(AnalyticsRollup.objects.count(), 3)
+
+    def test_separate_buckets_get_separate_rows(self):
+        now = datetime.datetime(2026, 1, 1, 10, 30)
+        with mock.patch.object(analytics.datetime, 'datetime', wraps=datetime.datetime) as clock:
+            clock.utcnow.return_value = now
+            self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+            clock.utcnow.return_value = now + datetime.timedelta(hours=1)
+            self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+        self.buffer.flush()
+
+        buckets = sorted(row['bucket'] for row in AnalyticsRollup._get_collection().find())
+        self.assertEqual(buckets, [datetime.datetime(2026, 1, 1, 10), datetime.datetime(2026, 1, 1, 11)])
+
+    def test_threshold_wakes_the_flusher(self):
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'b')
+        self.assertFalse(self.buffer._wakeup.is_set())
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'c')
+        self.assertTrue(self.buffer._wakeup.is_set())
+
+    def test_failed_flush_keeps_counts_for_retry(self):
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+        broken = mock.Mock()
+        broken.bulk_write.side_effect = Exception("connection reset")
+        with mock.patch.object(AnalyticsRollup, '_get_collection', return_value=broken):
+            with self.assertLogs('api.analytics', 'ERROR'):
+                self.assertEqual(self.buffer.flush(), 0)
+        self.buffer.increment(analytics.PRODUCT_VIEW, 'a')
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.rows()[(analytics.PRODUCT_VIEW, 'a')]['count'], 2)
+
+    def test_top_products_honours_window_and_limit(self):
+        now = analytics.bucket_start(datetime.datetime.utcnow(), analytics.buffer.bucket_seconds)
+        rows = [('a', 0, 5), ('a', 2, 5), ('b', 0, 7), ('c', 0, 1), ('d', 48, 100)]
+        AnalyticsRollup._get_collection().insert_many([
+            {'kind': analytics.PRODUCT_VIEW, 'key': key, 'bucket': now - datetime.timedelta(hours=age), 'count': count}
+            for key, age, count in rows
+        ] + [{'kind': analytics.COUPON_ATTEMPT, 'key': 'e', 'bucket': now, 'count': 50}])
+
+        self.assertEqual(
+            analytics.top_products(window_hours=24, limit=10),
+            [{'_id': 'a', 'views': 10}, {'_id': 'b', 'views': 7}, {'_id': 'c', 'views': 1}],
+        )
+        self.assertEqual([row['_id'] for row in analytics.top_products(window_hours=1, limit=2)], ['b', 'a'])
+        self.assertEqual(analytics.top_products(window_hours=72, limit=1), [{'_id': 'd', 'views': 100}])
+
+
+class CouponAnalyticsTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.buffer = analytics.CounterBuffer()
+        for patcher in (mock.patch.object(analytics, 'buffer', self.buffer),
+                        mock.patch.object(self.buffer, '_ensure_started')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        Coupon(code='SAVE10', discount_value=Decimal('10'), min_cart_value=Decimal('500')).save()
+        Coupon(code='OLD', discount_value=Decimal('10'), is_active=False).save()
+
+    def validate(self, code, cart_value=1000):
+        return APIClient().post('/api/coupons/validate/', {'code': code, 'cart_value': cart_value}, format='json')
+
+    def counts(self):
+        return {(key, field): amount for (kind, key, _, field), amount in self.buffer._counts.items()}
+
+    def test_outcomes_roll_up_per_coupon_and_misses_share_one_key(self):
+        self.assertEqual(self.validate(' save10 ').status_code, 200)
+        self.assertEqual(self.validate('SAVE10', cart_value=100).json()['reason'], 'below_minimum')
+        self.assertEqual(self.validate('NOPE').json()['reason'], 'not_found')
+        self.assertEqual(self.validate('ANOTHER-MISS').json()['reason'], 'not_found')
+
+        counts = self.counts()
+        self.assertEqual(counts[('SAVE10', 'count')], 2)
+        self.assertEqual(counts[('SAVE10', 'applied')], 1)
+        self.assertEqual(counts[('SAVE10', 'below_minimum')], 1)
+        self.assertEqual(counts[(analytics.UNKNOWN_COUPON, 'count')], 2)
+        self.assertEqual(counts[(analytics.UNKNOWN_COUPON, 'not_found')], 2)
+        self.assertNotIn(('NOPE', 'count'), counts)
+
+    def test_inactive_coupon_is_reported_under_its_code(self):
+        self.assertEqual(self.validate('old').json()['reason'], 'not_found')
+        self.assertEqual(self.counts()[('OLD', 'not_found')], 1)
+
+    def test_rejected_requests_are_not_tracked(self):
+        self.assertEqual(self.validate('').status_code, 400)
+        self.assertEqual(self.validate('X' * 65).status_code, 400)
+        self.assertEqual(self.counts(), {})
+
+
+class CategoryStatsTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        # Image variants are not under test here
+        patcher = mock.patch.object(images, 'schedule_variants')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sweets = Category(name="Sweets", slug="sweets")
+        self.sweets.save()
+        self.pickles = Category(name="Pickles", slug="pickles")
+        self.pickles.save()
+
+    def save_product(self, instance=None, **data):
+        payload = {
+            'name': 'Ladoo', 'description': '', 'price': '100.00', 'stock': 5,
+            'images': [], 'category_ids': [], 'attributes': {}, **data,
+        }
+        serializer = ProductSerializer(instance, data=payload)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def stats(self, category):
+        category.reload()
+        return (category.product_count, category.min_price, category.max_price)
+
+    def test_product_writes_refresh_the_categories_they_touch(self):
+        ladoo = self.save_product(category_ids=['Sweets'])
+        self.save_product(name='Barfi', price='250.00', discount_price='180.00', category_ids=[str(self.sweets.id)])
+        self.assertEqual(self.stats(self.sweets), (2, Decimal('100'), Decimal('180')))
+        self.assertEqual(self.stats(self.pickles), (0, None, None))
+
+        self.save_product(ladoo, category_ids=['pickles'])
+        self.assertEqual(self.stats(self.sweets), (1, Decimal('180'), Decimal('180')))
+        self.assertEqual(self.stats(self.pickles), (1, Decimal('100'), Decimal('100')))
+
+        self.save_product(ladoo, category_ids=['pickles'], is_active=False)
+        self.assertEqual(self.stats(self.pickles), (0, None, None))
+
+    def test_delete_refreshes_its_categories(self):
+        product = self.save_product(category_ids=['sweets'])
+        response = APIClient().delete(f'/api/products/{product.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.stats(self.sweets), (0, None, None))
+
+    def test_new_category_picks_up_products_that_already_reference_it(self):
+        self.save_product(category_ids=['spices'])
+        serializer = CategorySerializer(data={'name': 'Spices', 'slug': 'spices'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().product_count, 1)
+
+    def test_rebuild_all_matches_incremental_refreshes(self):
+        Product(name='A', price=Decimal('50'), category_ids=['Sweets', 'pickles']).save()
+        Product(name='B', price=Decimal('90'), discount_price=Decimal('70'), category_ids=[str(self.sweets.id)]).save()
+        Product(name='C', price=Decimal('10'), category_ids=['sweets'], is_active=False).save()
+        Product(name='D', price=Decimal('30'), category_ids=['unknown']).save()
+        Product(name='E', price=Decimal('30')).save()
+
+        self.assertEqual(catalog.rebuild_all(), 2)
+        rebuilt = {c.id: self.stats(c) for c in (self.sweets, self.pickles)}
+        self.assertEqual(rebuilt[self.sweets.id], (2, Decimal('50'), Decimal('70')))
+        self.assertEqual(rebuilt[self.pickles.id], (1, Decimal('50'), Decimal('50')))
+
+        Category._get_collection().update_many({}, {'$unset': {'stats_updated_at': 1}})
+        catalog.refresh_categories([self.sweets, self.pickles])
+        self.assertEqual({c.id: self.stats(c) for c in (self.sweets, self.pickles)}, rebuilt)
+
+    def test_older_refresh_never_overwrites_a_newer_one(self):
+        Product(name='A', price=Decimal('50'), category_ids=['sweets']).save()
+        catalog.refresh_categories([self.sweets])
+        self.sweets.reload()
+        newer = self.sweets.stats_updated_at
+
+        earlier = newer - datetime.timedelta(seconds=1)
+        Category._get_collection().bulk_write([catalog._stats_update(self.sweets.id, catalog.EMPTY_STATS, earlier)])
+        self.assertEqual(self.stats(self.sweets)[0], 1)
+        self.assertEqual(self.sweets.stats_updated_at, newer)
+
+
+def png_bytes(size=(800, 600), mode='RGBA'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 120, 40, 128) if mode == 'RGBA' else (200, 120, 40)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageVariantTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        public = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.addCleanup(public.cleanup)
+        self.media, self.public = media.name, public.name
+        settings = override_settings(
+            MEDIA_ROOT=self.media, IMAGE_SOURCE_DIRS=[self.public], IMAGE_VARIANT_WIDTHS=[320, 640, 1280],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_store_original_is_named_by_content_and_format(self):
+        data = png_bytes()
+        url = images.store_original(data, 'PNG')
+        self.assertEqual(url, f'/api/media/originals/{images.content_hash(data)[:2]}/{images.content_hash(data)}.png')
+        self.assertEqual(images.store_original(data, 'PNG'), url)
+        self.assertEqual(images.resolve_source(url).read_bytes(), data)
+
+    def test_build_variants_never_upscales_and_flattens_jpeg(self):
+        result = images.build_variants(png_bytes(), '/a.png')
+        sizes = [(v['width'], v['height'], v['format']) for v in result['variants']]
+        self.assertEqual(sizes, [
+            (320, 240, 'webp'), (320, 240, 'jpeg'),
+            (640, 480, 'webp'), (640, 480, 'jpeg'),
+            (800, 600, 'webp'), (800, 600, 'jpeg'),
+        ])
+        for variant in result['variants']:
+            with Image.open(images.resolve_source(variant['url'])) as image:
+                self.assertEqual(image.size, (variant['width'], variant['height']))
+                self.assertEqual(image.mode == 'RGB', variant['format'] == 'jpeg')
+        self.assertEqual(images.build_variants(png_bytes(), '/a.png'), result)
+
+    def test_media_view_serves_files_but_not_paths_outside_media_root(self):
+        url = images.store_original(png_bytes(), 'PNG')
+        client = APIClient()
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+        secret = os.path.join(os.path.dirname(self.media), 'secret.txt')
+        with open(secret, 'w') as handle:
+            handle.write('nope')
+        self.addCleanup(os.remove, secret)
+        for path in ('../secret.txt', '..%2Fsecret.txt', 'originals/../../secret.txt', 'originals'):
+            with self.subTest(path=path):
+                self.assertEqual(client.get(f'/api/media/{path}').status_code, 404)
+
+    def test_attach_variants_records_defaults_and_missing_fields(self):
+        os.makedirs(os.path.join(self.public, 'assets'))
+        with open(os.path.join(self.public, 'assets', 'hero.png'), 'wb') as handle:
+            handle.write(png_bytes())
+        # Stored without backgroundImage; mongoengine fills in /assets/hero.png
+        hero_id = Hero._get_collection().insert_one({'title': 'Fresh'}).inserted_id
+        product_id = Product._get_collection().insert_one({'name': 'Ladoo', 'price': 10.0}).inserted_id
+
+        self.assertEqual(len(images.attach_variants(Hero, hero_id)), 1)
+        stored = Hero._get_collection().find_one({'_id': hero_id})
+        self.assertEqual(stored['image_variants'][0]['source'], '/assets/hero.png')
+        self.assertNotIn('backgroundImage', stored)
+
+        self.assertEqual(images.attach_variants(Product, product_id), [])
+        self.assertEqual(Product._get_collection().find_one({'_id': product_id})['image_variants'], [])
+
+    def test_stale_job_does_not_overwrite_newer_images(self):
+        first = images.store_original(png_bytes(), 'PNG')
+        product = Product(name='Ladoo', price=Decimal('10'), images=[first])
+        product.save()
+        build_variants = images.build_variants
+
+        def edit_while_building(data, source):
+            Product._get_collection().update_one({'_id': product.id}, {'$set': {'images': ['/other.png']}})
+            return build_variants(data, source)
+
+        with mock.patch.object(images, 'build_variants', side_effect=edit_while_building):
+            images.attach_variants(Product, product.id)
+        self.assertEqual(Product._get_collection().find_one({'_id': product.id})['image_variants'], [])
+
+    def test_existing_sets_are_reused(self):
+        url = images.store_original(png_bytes(), 'PNG')
+        product = Product(name='Ladoo', price=Decimal('10'), images=[url])
+        product.save()
+        recorded = images.attach_variants(Product, product.id)
+        with mock.patch.object(images, 'build_variants') as build:
+            self.assertEqual(images.attach_variants(Product, product.id), recorded)
+        build.assert_not_called()
@@ -5,10 +5,12 @@ from rest_framework_simplejwt.views import (
 )
 from .views import (
     PageListView, PageDetailView, 
-    ProductListView, ProductDetailView,
-    CategoryListView, CouponListView,
+    ProductListView, ProductDetailView, ProductStockView,
+    CategoryListView, CategoryDetailView, CouponListView, CouponValidateView,
     StoryListView, StoryDetailView,
-    HeroView
+    HeroView, TopProductsView,
+    OrderListView, OrderDetailView, OrderConfirmView, OrderCancelView,
+    ImageUploadView, MediaFileView
 )
 
 urlpatterns = [
@@ -18,10 +20,20 @@ urlpatterns = [
     path('pages/<str:pk>/', PageDetailView.as_view(), name='page-detail'),
     path('products/', ProductListView.as_view(), name='product-list'),
     path('products/<str:pk>/', ProductDetailView.as_view(), name='product-detail'),
+    path('products/<str:pk>/stock/', ProductStockView.as_view(), name='product-stock'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
+    path('categories/<str:pk>/', CategoryDetailView.as_view(), name='category-detail'),
     path('coupons/', CouponListView.as_view(), name='coupon-list'),
+    path('coupons/validate/', CouponValidateView.as_view(), name='coupon-validate'),
     path('stories/', StoryListView.as_view(), name='story-list'),
     path('stories/<str:pk>/', StoryDetailView.as_view(), name='story-detail'),
     path('hero/', HeroView.as_view(), name='hero'),
+    path('orders/', OrderListView.as_view(), name='order-list'),
+    path('orders/<str:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('orders/<str:pk>/confirm/', OrderConfirmView.as_view(), name='order-confirm'),
+    path('orders/<str:pk>/cancel/', OrderCancelView.as_view(), name='order-cancel'),
+    path('images/', ImageUploadView.as_view(), name='image-upload'),
+    path('media/<path:path>', MediaFileView.as_view(), name='media-file'),
+    path('analytics/top-products/', TopProductsView.as_view(), name='analytics-top-products'),
 ]
 
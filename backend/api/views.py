@@ -1,22 +1,49 @@
 from rest_framework import status, views, permissions
 from rest_framework.response import Response
 import mongoengine
-from .models import Page, Product, Category, Coupon, Theme, Story, Hero
+from .models import Page, Product, Category, Coupon, Theme, Story, Hero, Order
+from . import analytics, catalog, images, orders, response_cache
+from django.conf import settings
+from django.http import FileResponse, Http404
+from PIL import Image, UnidentifiedImageError
+from rest_framework.parsers import MultiPartParser
+from pathlib import Path
+import io
 from .serializers import (
     PageSerializer, ProductSerializer, CategorySerializer, 
-    CouponSerializer, ThemeSerializer, StorySerializer, HeroSerializer
+    CouponSerializer, ThemeSerializer, StorySerializer, HeroSerializer,
+    OrderSerializer
 )
 from bson import ObjectId
+from decimal import Decimal, InvalidOperation
+import datetime
+
+MAX_COUPON_CODE_LENGTH = 64
+MAX_TOP_PRODUCTS_WINDOW = 24 * 365 # hours
+MAX_TOP_PRODUCTS_LIMIT = 100
+PUBLIC_ORDER_FIELDS = ('id', '_id', 'items', 'total', 'status', 'reserved_until')
 
 class MongoBaseView(views.APIView):
     model = None
     serializer_class = None
+    # GETs are cached by api.middleware.CompressedResponseCacheMiddleware under
+    # this resource name, keyed by path and the query parameters listed in
+    # `cache_query_params`; successful writes drop the resources in `invalidates`.
+    cache_resource = None
+    cache_query_params = ()
+    invalidates = ()
 
     def get_permissions(self):
         # Temporarily allowing all access to fix the 401 error in dev
         # TODO: Restore IsAuthenticated before production
         return [permissions.AllowAny()]
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and self.invalidates:
+            response_cache.invalidate(*self.invalidates)
+        return response
+
     def get_object(self, pk):
         try:
             return self.model.objects.get(id=pk)
@@ -26,6 +53,8 @@ class MongoBaseView(views.APIView):
 class PageListView(MongoBaseView):
     model = Page
     serializer_class = PageSerializer
+    cache_resource = 'pages'
+    invalidates = ('pages',)
 
     def get(self, request):
         pages = Page.objects.all()
@@ -47,6 +76,8 @@ class PageListView(MongoBaseView):
 class PageDetailView(MongoBaseView):
     model = Page
     serializer_class = PageSerializer
+    cache_resource = 'pages'
+    invalidates = ('pages',)
 
     def get(self, request, pk):
         page = self.get_object(pk)
@@ -80,6 +111,8 @@ class PageDetailView(MongoBaseView):
 class ProductListView(MongoBaseView):
     model = Product
     serializer_class = ProductSerializer
+    cache_resource = 'products'
+    invalidates = ('products', 'categories')
 
     def get(self, request):
         products = Product.objects.all()
@@ -96,6 +129,8 @@ class ProductListView(MongoBaseView):
 class CategoryListView(MongoBaseView):
     model = Category
     serializer_class = CategorySerializer
+    cache_resource = 'categories'
+    invalidates = ('categories',)
 
     def get(self, request):
         categories = Category.objects.all()
@@ -109,6 +144,39 @@ class CategoryListView(MongoBaseView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class CategoryDetailView(MongoBaseView):
+    model = Category
+    serializer_class = CategorySerializer
+    cache_resource = 'categories'
+    invalidates = ('categories',)
+
+    def get(self, request, pk):
+        category = self.get_object(pk)
+        if not category:
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = CategorySerializer(category)
+        return Response(serializer.data)
+
+    def put(self, request, pk):
+        category = self.get_object(pk)
+        if not category:
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        serializer = CategorySerializer(category, data=request.data)
+        if serializer.is_valid():
+            try:
+                serializer.save()
+                return Response(serializer.data)
+            except mongoengine.errors.NotUniqueError:
+                return Response({"error": "Another category already uses this slug."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def delete(self, request, pk):
+        category = self.get_object(pk)
+        if not category:
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        category.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class CouponListView(MongoBaseView):
     model = Coupon
     serializer_class = CouponSerializer
@@ -124,14 +192,75 @@ class CouponListView(MongoBaseView):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class CouponValidateView(MongoBaseView):
+    model = Coupon
+
+    def post(self, request):
+        code = str(request.data.get('code', '')).strip().upper()
+        if not code:
+            return Response({"error": "A coupon code is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(code) > MAX_COUPON_CODE_LENGTH:
+            return Response({"error": "Coupon code is too long."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cart_value = Decimal(str(request.data.get('cart_value', 0)))
+        except InvalidOperation:
+            return Response({"error": "cart_value must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Codes are stored upper-cased, so an exact match can use the unique index
+        coupon = Coupon.objects(code=code).first()
+        if not coupon or not coupon.is_active:
+            outcome, error = "not_found", "This coupon does not exist."
+        elif coupon.expiry_date and coupon.expiry_date < datetime.datetime.utcnow():
+            outcome, error = "expired", "This coupon has expired."
+        elif coupon.usage_limit is not None and coupon.usage_count >= coupon.usage_limit:
+            outcome, error = "exhausted", "This coupon has reached its usage limit."
+        elif cart_value < (coupon.min_cart_value or 0):
+            outcome, error = "below_minimum", "Cart value is below the minimum for this coupon."
+        else:
+            outcome, error = "applied", None
+
+        # Only real coupons get their own rollup key; misses share one
+        analytics.track_coupon_attempt(coupon.code if coupon else analytics.UNKNOWN_COUPON, outcome)
+        if error:
+            return Response({"valid": False, "reason": outcome, "error": error}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = CouponSerializer(coupon)
+        return Response({"valid": True, "coupon": serializer.data})
+
+class TopProductsView(MongoBaseView):
+    def get(self, request):
+        try:
+            window = int(request.query_params.get('window', 24))
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({"error": "window and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= window <= MAX_TOP_PRODUCTS_WINDOW:
+            return Response({"error": f"window must be between 1 and {MAX_TOP_PRODUCTS_WINDOW} hours."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= MAX_TOP_PRODUCTS_LIMIT:
+            return Response({"error": f"limit must be between 1 and {MAX_TOP_PRODUCTS_LIMIT}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = analytics.top_products(window_hours=window, limit=limit)
+        ids = [row['_id'] for row in rows if ObjectId.is_valid(row['_id'])]
+        names = {str(p.id): p.name for p in Product.objects(id__in=ids).only('name')}
+        return Response({
+            "window_hours": window,
+            "results": [
+                {"product_id": row['_id'], "name": names.get(row['_id']), "views": row['views']}
+                for row in rows
+            ],
+        })
+
 class ProductDetailView(MongoBaseView):
     model = Product
     serializer_class = ProductSerializer
+    # Not cached (views are counted per request) but edits change cached lists
+    invalidates = ('products', 'categories')
 
     def get(self, request, pk):
         product = self.get_object(pk)
         if not product:
             return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        analytics.track_product_view(product.id)
         serializer = ProductSerializer(product)
         return Response(serializer.data)
 
@@ -150,11 +279,34 @@ class ProductDetailView(MongoBaseView):
         if not product:
             return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
         product.delete()
+        catalog.refresh_for_product_change(old_refs=product.category_ids)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class ProductStockView(MongoBaseView):
+    model = Product
+    invalidates = ('products',)
+
+    def get_permissions(self):
+        # Stock corrections come from the admin; orders adjust it themselves
+        return [permissions.IsAdminUser()]
+
+    def post(self, request, pk):
+        try:
+            delta = int(request.data.get('delta'))
+        except (TypeError, ValueError):
+            return Response({"error": "delta must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if not ObjectId.is_valid(pk) or not Product.objects(id=pk).count():
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        if orders.adjust_stock(pk, delta) is None:
+            return Response({"error": "Stock cannot go below zero."}, status=status.HTTP_409_CONFLICT)
+        serializer = ProductSerializer(self.get_object(pk))
+        return Response(serializer.data)
+
 class StoryListView(MongoBaseView):
     model = Story
     serializer_class = StorySerializer
+    cache_resource = 'stories'
+    invalidates = ('stories',)
 
     def get(self, request):
         stories = Story.objects.all()
@@ -171,6 +323,8 @@ class StoryListView(MongoBaseView):
 class StoryDetailView(MongoBaseView):
     model = Story
     serializer_class = StorySerializer
+    cache_resource = 'stories'
+    invalidates = ('stories',)
 
     def get(self, request, pk):
         story = self.get_object(pk)
@@ -199,6 +353,8 @@ class StoryDetailView(MongoBaseView):
 class HeroView(MongoBaseView):
     model = Hero
     serializer_class = HeroSerializer
+    cache_resource = 'hero'
+    invalidates = ('hero',)
 
     def get(self, request):
         # Get the active hero or create a default one if none exists
@@ -219,3 +375,121 @@ class HeroView(MongoBaseView):
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class OrderListView(MongoBaseView):
+    model = Order
+    serializer_class = OrderSerializer
+    # Placing an order takes stock shown in product lists
+    invalidates = ('products',)
+
+    def get_permissions(self):
+        # Anyone can check out; only staff can list every customer's orders
+        if self.request.method == 'POST':
+            return [permissions.AllowAny()]
+        return [permissions.IsAdminUser()]
+
+    def get(self, request):
+        orders_qs = Order.objects.order_by('-created_at')
+        serializer = OrderSerializer(orders_qs, many=True)
+        return Response(serializer.data)
+
+    def post(self, request):
+        serializer = OrderSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            order = orders.place_order(serializer.validated_data['items'], serializer.validated_data['customer'])
+        except orders.OutOfStock as e:
+            return Response(
+                {"error": "Some items are out of stock.", "product_ids": e.product_ids},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+class OrderDetailView(MongoBaseView):
+    model = Order
+    serializer_class = OrderSerializer
+
+    def get(self, request, pk):
+        order = self.get_object(pk)
+        if not order:
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        data = OrderSerializer(order).data
+        if not request.user.is_staff:
+            # Order ids are guessable, so anyone else only sees the order's
+            # progress, never the customer's contact details
+            data = {field: data[field] for field in PUBLIC_ORDER_FIELDS}
+        return Response(data)
+
+class OrderConfirmView(MongoBaseView):
+    model = Order
+    # Drops the order's holds from its products
+    invalidates = ('products',)
+
+    def get_permissions(self):
+        # Marking an order paid is done by staff once payment is verified
+        return [permissions.IsAdminUser()]
+
+    def post(self, request, pk):
+        order = self.get_object(pk)
+        if not order:
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not orders.confirm_payment(order):
+            return Response({"error": "This order is no longer awaiting payment."}, status=status.HTTP_409_CONFLICT)
+        order.reload()
+        return Response(OrderSerializer(order).data)
+
+class OrderCancelView(MongoBaseView):
+    model = Order
+    # Cancelling returns the order's stock
+    invalidates = ('products',)
+
+    def get_permissions(self):
+        return [permissions.IsAdminUser()]
+
+    def post(self, request, pk):
+        order = self.get_object(pk)
+        if not order:
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+        if not orders.cancel_order(order):
+            return Response({"error": "Only unpaid orders can be cancelled."}, status=status.HTTP_409_CONFLICT)
+        order.reload()
+        return Response(OrderSerializer(order).data)
+
+class ImageUploadView(MongoBaseView):
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({"error": "Upload an image in the 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.IMAGE_MAX_UPLOAD_BYTES:
+            return Response({"error": "Image is too large."}, status=status.HTTP_400_BAD_REQUEST)
+        data = upload.read()
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.verify()
+                image_format = image.format
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            image_format = None
+        if image_format not in images.FORMAT_EXTENSIONS:
+            return Response({"error": "File is not a supported image."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the original is written here; variants are built on the worker
+        # pool once a document referencing this URL is saved.
+        url = images.store_original(data, image_format)
+        return Response({"url": url, "hash": images.content_hash(data)}, status=status.HTTP_201_CREATED)
+
+class MediaFileView(views.APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, path):
+        root = Path(settings.MEDIA_ROOT).resolve()
+        target = (root / path).resolve()
+        if root not in target.parents or not target.is_file():
+            raise Http404
+        response = FileResponse(open(target, 'rb'))
+        # Filenames are content hashes, so a given URL never changes
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        return response
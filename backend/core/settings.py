@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.CompressedResponseCacheMiddleware',
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True 
@@ -94,6 +95,14 @@ else:
         port=MONGODB_PORT,
     )
 
+# Buffered analytics (see api/analytics.py)
+ANALYTICS_FLUSH_INTERVAL = env.int('ANALYTICS_FLUSH_INTERVAL', default=10) # seconds
+ANALYTICS_FLUSH_THRESHOLD = env.int('ANALYTICS_FLUSH_THRESHOLD', default=500) # pending counters
+ANALYTICS_BUCKET_SECONDS = env.int('ANALYTICS_BUCKET_SECONDS', default=3600)
+
+# Unpaid orders hold their stock for this long (see api/orders.py)
+ORDER_RESERVATION_MINUTES = env.int('ORDER_RESERVATION_MINUTES', default=15)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator' },
@@ -110,9 +119,36 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'COERCE_DECIMAL_TO_STRING': False,
 }
 
+# Shared by every worker, so a write handled by one invalidates the others.
+# Redis when REDIS_URL is set, otherwise files on the local disk (one host).
+REDIS_URL = env('REDIS_URL', default=None)
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': env('CACHE_DIR', default=str(BASE_DIR / '.cache')),
+        }
+    }
+
+# Rendered GET responses plus their gzip/brotli bodies (see api/middleware.py)
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=60)
+RESPONSE_COMPRESS_MIN_LENGTH = 512
+
 # Simple JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -129,4 +165,16 @@ USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = 'static/'
+
+# Uploaded originals and resized variants (see api/images.py)
+MEDIA_ROOT = env('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+MEDIA_URL = '/api/media/'
+IMAGE_VARIANT_WIDTHS = [320, 640, 960, 1280, 1920]
+IMAGE_WORKERS = env.int('IMAGE_WORKERS', default=2)
+IMAGE_MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Where paths like /assets/honey.png already stored on documents live
+IMAGE_SOURCE_DIRS = [
+    BASE_DIR.parent / 'website-frontend' / 'public',
+    BASE_DIR.parent / 'admin-frontend' / 'public',
+]
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
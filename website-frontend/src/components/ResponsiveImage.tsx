@@ -0,0 +1,67 @@
+import type { ImgHTMLAttributes } from 'react';
+
+// Resized copies the API attaches to a document as `image_variants`,
+// one set per original image path (see backend/api/images.py)
+export interface ImageVariant {
+    width: number;
+    height: number;
+    format: 'webp' | 'jpeg';
+    url: string;
+}
+
+export interface ImageVariantSet {
+    source: string;
+    width: number;
+    height: number;
+    variants: ImageVariant[];
+}
+
+const API_ORIGIN = 'http://localhost:8000';
+
+export const resolveImageUrl = (url: string | undefined) => {
+    if (!url) return '';
+    if (url.startsWith('data:') || url.startsWith('http')) return url;
+    // Uploaded originals and variants are served by the API
+    if (url.startsWith('/api/media/')) return API_ORIGIN + url;
+    return url;
+};
+
+const srcSet = (variants: ImageVariant[], format: ImageVariant['format']) =>
+    variants
+        .filter(v => v.format === format)
+        .map(v => `${resolveImageUrl(v.url)} ${v.width}w`)
+        .join(', ');
+
+interface ResponsiveImageProps extends ImgHTMLAttributes<HTMLImageElement> {
+    src: string | undefined;
+    variants?: ImageVariantSet[];
+    sizes?: string;
+}
+
+// Renders WebP variants with a JPEG fallback so the browser downloads the
+// smallest copy that fills the slot; images without variants render as-is.
+export default function ResponsiveImage({ src, variants, sizes = '100vw', ...props }: ResponsiveImageProps) {
+    const set = variants?.find(v => v.source === src);
+    if (!set || set.variants.length === 0) {
+        return <img src={resolveImageUrl(src)} {...props} />;
+    }
+
+    const jpeg = set.variants.filter(v => v.format === 'jpeg');
+    const fallback = jpeg[jpeg.length - 1];
+    return (
+        // display: contents keeps layout and classes on the <img> unchanged
+        <picture style={{ display: 'contents' }}>
+            <source type="image/webp" srcSet={srcSet(set.variants, 'webp')} sizes={sizes} />
+            <img
+                src={resolveImageUrl(fallback ? fallback.url : src)}
+                srcSet={srcSet(set.variants, 'jpeg') || undefined}
+                sizes={sizes}
+                width={set.width}
+                height={set.height}
+                loading="lazy"
+                decoding="async"
+                {...props}
+            />
+        </picture>
+    );
+}
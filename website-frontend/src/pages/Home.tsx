@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom';
 import { Leaf, ArrowRight, ShoppingBag, ChevronDown } from 'lucide-react';
 import { motion, useScroll, useTransform, AnimatePresence } from 'framer-motion';
 import { useCart } from '../context/CartContext';
+import ResponsiveImage, { resolveImageUrl, type ImageVariantSet } from '../components/ResponsiveImage';
 
 interface Product {
     _id: string;
@@ -11,6 +12,7 @@ interface Product {
     price: number;
     images: string[];
     is_active: boolean;
+    image_variants?: ImageVariantSet[];
 }
 
 interface Page {
@@ -36,6 +38,7 @@ interface Story {
     shortExcerpt: string;
     fullStoryContent: StoryContent[];
     is_active: boolean;
+    image_variants?: ImageVariantSet[];
 }
 
 interface Hero {
@@ -52,12 +55,6 @@ interface Hero {
 
 const API_URL = 'http://localhost:8000/api';
 
-const resolveImageUrl = (url: string | undefined) => {
-    if (!url) return '';
-    if (url.startsWith('data:') || url.startsWith('http')) return url;
-    return url;
-};
-
 export default function Home() {
     const [products, setProducts] = useState<Product[]>([]);
     const [pages, setPages] = useState<Page[]>([]);
@@ -226,7 +223,7 @@ export default function Home() {
                                 className={`relative group ${index % 2 !== 0 ? 'md:mt-32' : ''}`}
                             >
                                 <div className="aspect-[3/4] relative rounded-[2.5rem] overflow-hidden border border-white/10 bg-black/20 backdrop-blur-sm shadow-2xl transition-all duration-500 hover:border-[#5c8d37]/50 hover:shadow-[#5c8d37]/20">
-                                    <img src={resolveImageUrl(product.images[0])} alt={product.name} className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-110" />
+                                    <ResponsiveImage src={product.images[0]} variants={product.image_variants} sizes="(min-width: 768px) 50vw, 100vw" alt={product.name} className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-110" />
 
                                     {/* Overlay Info */}
                                     <div className="absolute inset-x-0 bottom-0 p-6 bg-gradient-to-t from-black/90 to-transparent">
@@ -279,7 +276,7 @@ export default function Home() {
                                     className={`cursor-pointer group relative rounded-2xl overflow-hidden aspect-[3/4] ${i % 3 === 1 ? 'md:mt-12' : i % 3 === 2 ? 'md:mt-24' : ''
                                         }`}
                                 >
-                                    <img src={resolveImageUrl(story.thumbnailImage)} className="w-full h-full object-cover grayscale group-hover:grayscale-0 transition-all duration-700" />
+                                    <ResponsiveImage src={story.thumbnailImage} variants={story.image_variants} sizes="(min-width: 768px) 33vw, 100vw" className="w-full h-full object-cover grayscale group-hover:grayscale-0 transition-all duration-700" />
                                     <div className="absolute inset-0 bg-black/50 group-hover:bg-black/20 transition-all" />
                                     <div className="absolute bottom-0 left-0 p-6 w-full">
                                         <div className="h-[1px] w-full bg-[#5c8d37] origin-left scale-x-0 group-hover:scale-x-100 transition-transform duration-500 mb-3" />
@@ -323,7 +320,7 @@ export default function Home() {
                             <ArrowRight className="rotate-45" size={24} />
                         </button>
                         <div className="w-full h-[70vh] relative">
-                            <img src={resolveImageUrl(selectedStory.heroImage)} className="w-full h-full object-cover" />
+                            <ResponsiveImage src={selectedStory.heroImage} variants={selectedStory.image_variants} loading="eager" className="w-full h-full object-cover" />
                             <div className="absolute inset-0 bg-gradient-to-t from-[#0a0d08] to-transparent flex items-end p-12">
                                 <h1 className="text-5xl md:text-8xl font-black text-white max-w-5xl font-serif">{selectedStory.title}</h1>
                             </div>
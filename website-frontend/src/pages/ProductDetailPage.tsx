@@ -3,6 +3,7 @@ import { useParams, Link, useNavigate } from 'react-router-dom';
 import { Leaf, ArrowLeft, ShoppingBag, ShieldCheck, Truck, Clock, ChevronRight, Info } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useCart } from '../context/CartContext';
+import ResponsiveImage, { resolveImageUrl, type ImageVariantSet } from '../components/ResponsiveImage';
 
 interface Product {
     _id: string;
@@ -13,6 +14,7 @@ interface Product {
     category_ids: string[];
     stock: number;
     is_active: boolean;
+    image_variants?: ImageVariantSet[];
     attributes?: {
         ingredients?: string[];
         allergens?: string[];
@@ -209,12 +211,6 @@ const styles = {
     }
 };
 
-const resolveImageUrl = (url: string | undefined) => {
-    if (!url) return '';
-    if (url.startsWith('data:') || url.startsWith('http')) return url;
-    return url;
-};
-
 export default function ProductDetailPage() {
     const { id } = useParams();
     const navigate = useNavigate();
@@ -343,15 +339,22 @@ export default function ProductDetailPage() {
                             style={styles.mainImageContainer}
                         >
                             <AnimatePresence mode="wait">
-                                <motion.img
+                                <motion.div
                                     key={activeImage}
                                     initial={{ opacity: 0 }}
                                     animate={{ opacity: 1 }}
                                     exit={{ opacity: 0 }}
-                                    src={resolveImageUrl(product.images[activeImage])}
-                                    alt={product.name}
                                     style={styles.mainImage}
-                                />
+                                >
+                                    <ResponsiveImage
+                                        src={product.images[activeImage]}
+                                        variants={product.image_variants}
+                                        sizes="(min-width: 1024px) 55vw, 100vw"
+                                        loading="eager"
+                                        alt={product.name}
+                                        style={styles.mainImage}
+                                    />
+                                </motion.div>
                             </AnimatePresence>
                         </motion.div>
 
@@ -367,7 +370,7 @@ export default function ProductDetailPage() {
                                         }}
                                         onClick={() => setActiveImage(idx)}
                                     >
-                                        <img src={resolveImageUrl(img)} alt="" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+                                        <ResponsiveImage src={img} variants={product.image_variants} sizes="120px" alt="" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
                                     </div>
                                 ))}
                             </div>
@@ -505,7 +508,7 @@ export default function ProductDetailPage() {
                                 onClick={() => navigate(`/products/${p._id}`)}
                             >
                                 <div style={{ aspectRatio: '1/1', borderRadius: '24px', overflow: 'hidden', marginBottom: '16px', background: 'rgba(255,255,255,0.02)' }}>
-                                    <img src={resolveImageUrl(p.images[0])} alt={p.name} style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+                                    <ResponsiveImage src={p.images[0]} variants={p.image_variants} sizes="25vw" alt={p.name} style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
                                 </div>
                                 <h3 style={{ fontSize: '18px', fontWeight: 800, marginBottom: '8px' }}>{p.name}</h3>
                                 <div style={{ color: '#5c8d37', fontWeight: 900 }}>₹{Number(p.price).toFixed(2)}</div>
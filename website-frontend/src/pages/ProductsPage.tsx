@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom';
 import { Leaf, ShoppingBag, ArrowLeft } from 'lucide-react';
 import { motion, useScroll, useTransform } from 'framer-motion';
 import { useCart } from '../context/CartContext';
+import ResponsiveImage, { resolveImageUrl, type ImageVariantSet } from '../components/ResponsiveImage';
 
 interface Product {
     _id: string;
@@ -13,16 +14,11 @@ interface Product {
     images: string[];
     category_ids: string[];
     is_active: boolean;
+    image_variants?: ImageVariantSet[];
 }
 
 const API_URL = 'http://localhost:8000/api';
 
-const resolveImageUrl = (url: string | undefined) => {
-    if (!url) return '';
-    if (url.startsWith('data:') || url.startsWith('http')) return url;
-    return url;
-};
-
 export default function ProductsPage() {
     const [products, setProducts] = useState<Product[]>([]);
     const [loading, setLoading] = useState(true);
@@ -189,8 +185,10 @@ export default function ProductsPage() {
                             >
                                 <Link to={`/products/${product._id}`} className="block">
                                     <div className="aspect-[4/5] relative rounded-[2rem] overflow-hidden border border-white/10 bg-black/20 backdrop-blur-sm shadow-2xl transition-all duration-500 group-hover:border-[#5c8d37]/50 group-hover:shadow-[#5c8d37]/20">
-                                        <img
-                                            src={resolveImageUrl(product.images[0])}
+                                        <ResponsiveImage
+                                            src={product.images[0]}
+                                            variants={product.image_variants}
+                                            sizes="(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw"
                                             alt={product.name}
                                             className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-110"
                                         />